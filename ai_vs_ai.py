@@ -1,8 +1,12 @@
 """
 AI (Computer) plays another AI (Computer)
-The both play randomly without any strategy
+The both play randomly without any strategy, unless --white or --black search
 """
-import random
+import argparse
+from collections import Counter, namedtuple
+from bitboard import Position, SQUARES, legal_moves, move_name
+from game_output import GameOutput, QUIET, RESULT, EVERY_PLY, open_log
+from search import PLAYERS, make_player, random_player
 
 board = [
     ["R", "N", "B", "Q", "K", "B", "N", "R"],
@@ -15,9 +19,14 @@ board = [
     ["r", "n", "b", "q", "k", "b", "n", "r"],
 ]
 
-def display_board():
+position = Position(board) # Bitboards kept in step with board
+
+# Outcome is "WHITE", "BLACK" or "DRAW", moves are in coordinate notation eg. 'e2e4'
+GameResult = namedtuple("GameResult", ["outcome", "plies", "moves"])
+
+def display_board(board=board):
     """Displays the current state of the chess board.
-    Takes no argument and return None.
+    Takes an optional list of list of strings board and return None.
     """
     for row in board:
         print(row)
@@ -29,284 +38,163 @@ def pawn_moves(is_white_turn, curr_pos):
     Takes a tuple of integers curr_pos and a boolean is_white_turn and 
     returns a list of tuple of integers possible moves
     """
-    possible_moves = []
-    row, col = curr_pos
-    dxn = -1 if is_white_turn else 1 
-    next_row = row + dxn
-
-    if 0 <= next_row <= 7:
-        # Normal moves
-        if board[next_row][col] == '.':
-            possible_moves.append((next_row, col))
-            if (row == 6 and is_white_turn) or (row == 1 and not is_white_turn):
-                if board[next_row + dxn][col] == '.':
-                    possible_moves.append((next_row + dxn, col))
-                
-        # Attack moves
-        for attack_col in [col - 1, col + 1]:
-            if 0 <= attack_col <= 7:
-                if board[next_row][attack_col] != '.' and (board[next_row][attack_col].isupper() != board[row][col].isupper()):
-                    possible_moves.append((next_row, attack_col))
-
-    return possible_moves
+    return position.pawn_moves(is_white_turn, curr_pos)
 
 def rook_moves(curr_pos):
     """Finds and returns all possible moves a rook can make
     Takes a tuple of integers, curr_pos returns a list of tuple of integers, possible moves
     """
-    possible_moves = []
-    row, col = curr_pos
-
-    # Define directions: right, left, down, up
-    directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-
-    for dx, dy in directions:
-        temp_row, temp_col = row, col
-        while 0 <= temp_row + dx <= 7 and 0 <= temp_col + dy <= 7:
-            temp_row += dx
-            temp_col += dy
-            move = (temp_row, temp_col)
-            if board[temp_row][temp_col] == ".":  # Normal move
-                possible_moves.append(move)
-            else:
-                if board[row][col].isupper() != board[temp_row][temp_col].isupper():  # Attack move
-                    possible_moves.append(move)
-                break
-
-    return possible_moves
+    return position.rook_moves(curr_pos)
         
 def knight_moves(curr_pos):
     """Finds and returns all possible moves a knight can make
     Takes a tuple of integers, curr_pos returns a list of tuple of integers, possible moves
     """
-    possible_moves = []
-    row, col = curr_pos
-    changes = [2, -2, 1, -1]
-    for i in changes:
-        for j in changes:
-            if abs(i) == abs(j): # Not a valid move for knight
-                continue
-            if (row+i > 7 or row+i < 0) or (col+j > 7 or col+j < 0): # Out of board
-                continue
-            move = (row + i, col + j)
-            if (board[row+i][col+j] == ".") or (board[row][col].isupper() != board[row+i][col+j].isupper()):
-                possible_moves.append(move) # Normal or Attack move
-    
-    return possible_moves
+    return position.knight_moves(curr_pos)
         
 def bishop_moves(curr_pos):
     """Finds and returns all possible moves a bishop can make
     Takes a tuple of integers, curr_pos returns a list of tuple of integers, possible moves
     """
-    possible_moves = []
-    row, col = curr_pos
-
-    # Define diagonal directions: top-right, top-left, bottom-left, bottom-right
-    directions = [(-1, 1), (-1, -1), (1, -1), (1, 1)]
-
-    for dx, dy in directions:
-        temp_row, temp_col = row, col
-        while 0 <= temp_row + dx <= 7 and 0 <= temp_col + dy <= 7:
-            temp_row += dx
-            temp_col += dy
-            move = (temp_row, temp_col)
-            if board[temp_row][temp_col] == ".":  # Normal move
-                possible_moves.append(move)
-            else:
-                if board[row][col].isupper() != board[temp_row][temp_col].isupper():  # Attack move
-                    possible_moves.append(move)
-                break
-
-    return possible_moves
+    return position.bishop_moves(curr_pos)
 
 def queen_moves(curr_pos):
     """Finds and returns all possible moves a queen can make
     Takes a tuple of integers, curr_pos returns a list of tuple of integers, possible moves
     """
-    possible_moves = bishop_moves(curr_pos) + rook_moves(curr_pos)
-    return possible_moves
+    return position.queen_moves(curr_pos)
 
 def get_all_chars(is_white_turn):
     """Finds and returns the positions of all characters of a player
     Takes a boolean is_white_turn and returns a list of tuple of integers, characters
     """
-    characters = []
-    for i in range(8):
-        for j in range(8):
-            curr_char = board[i][j]
-            pos = (i, j)
-            if curr_char == ".":
-                continue
-            if is_white_turn:
-                if curr_char.islower():
-                    characters.append(pos)
-            else:
-                if curr_char.isupper():
-                    characters.append(pos)
-    return characters
+    return [SQUARES[sq] for sq in position.piece_squares(is_white_turn)]
 
 def get_all_moves(is_white_turn):
     """Gets and returns the possibles moves of all characters(except king) of a player
     Takes a boolean is_white_turn and returns a list of list of tuple of integers, all_moves
     """
-    all_characters = get_all_chars(is_white_turn)
-    all_moves = []
-    for pos in all_characters:
-        row, col = pos
-        char = board[row][col]
-        if char == "p" or char == "P":
-            all_moves += [[pos, new_pos] for new_pos in pawn_moves(is_white_turn, pos)]
-        elif char == "r" or char == "R":
-            all_moves += [[pos, new_pos] for new_pos in rook_moves(pos)]
-        elif char == "n" or char == "N":
-            all_moves += [[pos, new_pos] for new_pos in knight_moves(pos)]
-        elif char == "b" or char == "B" :
-            all_moves += [[pos, new_pos] for new_pos in bishop_moves(pos)]
-        elif char == "q" or char == "Q":
-            all_moves += [[pos, new_pos] for new_pos in queen_moves(pos)]
-                
-    return all_moves
+    return position.get_all_moves(is_white_turn)
 
 def get_king_pos(is_white_turn):
     """Get's the current positon of the king
     Takes boolean is_white_turn and returns a tuple of integers.
     """
-    king_type = "k" if is_white_turn else "K"
-    for i in range(8):
-        for j in range(8):
-            if board[i][j] == king_type:
-                return (i, j)
-    return (0, 0)
+    sq = position.king_square[is_white_turn]
+    return (0, 0) if sq is None else SQUARES[sq]
 
 def is_king_in_check(is_white_turn, curr_pos):
     """Returns True if the king of the current player is in check. Else it returns False.
     Takes boolean is_white_turn and tuple of integers curr_pos
     """
-    in_check = False
-    for pos in get_all_moves(not is_white_turn):
-        if pos[1] == curr_pos:
-            in_check = True
-            break
-        
-    if not in_check: # Check if there's an attacking enemy king
-        row, col = curr_pos
-        changes = [-1, 0, 1]
-        for i in changes:
-            for j in changes:
-                if (i == 0) and (j == 0):
-                    continue
-                if (row+i > 7 or row+i < 0) or (col+j > 7 or col-j < 0): # Out of board
-                    continue
-                if board[row+i][col+j].lower() == "k":
-                    in_check = True
-        
-    return in_check
-
-def reverse(prev_board):
-    """Reverses the board one move back
-    Takes a list of list of strings prev_board"""
-    for i in range(8):
-        for j in range(8):
-            board[i][j] = prev_board[i][j]
-    return None
+    return position.is_king_in_check(is_white_turn, curr_pos)
 
 def king_moves(is_white_turn, curr_pos):
     """Finds and returns all possible moves a king can make
     Takes a boolean is_white_turn and a tuple of integers curr_pos.
     """
-    row, col = curr_pos
-    changes = [-1, 0, 1]
-    possible_moves = []
-    for i in changes:
-        for j in changes:
-            if (i == 0) and (j == 0):
-                continue
-            if (row+i > 7 or row+i < 0) or (col+j > 7 or col+j < 0): # Out of board
-                continue
-            move = (row+i, col+j)
-            # Normal or Attack moves
-            if (board[row+i][col+j] == ".") or (board[row][col].isupper() != board[row+i][col+j].isupper()):
-                temp_board = [row.copy() for row in board] # Save a temporay version of the board
-                make_move(curr_pos, move) # Make a temporary move
-                if not is_king_in_check(is_white_turn, move): # Check if the king is safe after the temporary move
-                    possible_moves.append([curr_pos, move])
-                reverse(temp_board) # Reverse the temporary move
-                    
-    return possible_moves
+    return position.king_moves(is_white_turn, curr_pos)
 
 def make_move(curr_pos, next_pos):
     """Implements a move by replacing the character in next_pos by the character in curr_pos
     If the character that is replaced is a king, the function return False. Else it returns True
     Takes a list of tuple curr_pos and another list of typle next_pos and returns a boolean
     """
-    row0, col0 = curr_pos
-    row1, col1 = next_pos
-    char = board[row0][col0] # Get character at current position
-    attacked_char = board[row1][col1] # Get character at the position being attacked
-    
-    if char == "p" and (row0 != 0 and row1 == 0): # White-pawn promotion
-        char = random.choice(["n", "q", "b", "r"])
-    elif char == "P" and (row0 != 7 and row1 == 7): # Black-pawn promotion
-        char = random.choice(["N", "Q", "B", "R"])
-    
-    # Move character to new position
-    board[row1][col1] = char 
-    board[row0][col0] = "."
+    attacked_char = position.make_move(curr_pos, next_pos).captured
     
     if attacked_char.lower() == "k":
         return False
     else:
         return True
 
+def unmake_move():
+    """Reverses the board one move back
+    Takes nothing and returns None
+    """
+    position.unmake_move()
+    return None
+
 
 # Main game loop
-def game(): 
-    is_white_turn = True  # White starts
+def game(position=position, verbosity=EVERY_PLY, sink=None, repetitions=True, white=random_player, black=random_player):
+    """Plays one game from position, which defaults to the module's board
+    Takes a Position, an integer verbosity (see game_output), an optional
+    file-like sink for the output, a boolean repetitions (False plays on
+    through threefold repetitions) and the players of white and black (see
+    search) and returns a GameResult
+    """
+    out = GameOutput(verbosity, sink)
+    board = position.board
+    is_white_turn = position.is_white_turn
     running, draw = True, False
     winner = None
     no_captures_moves = 0  # Moves made without any captures or pawn movements
+    seen = Counter([position.key]) # Times each position occurred since the last capture or pawn move
+    moves_made = []
 
     while running:
         if no_captures_moves >= 100:  # Draw by fifty-move rule
             draw = True
             break
+        if repetitions and seen[position.key] >= 3: # Draw by threefold repetition
+            draw = True
+            break
         
-        display_board()
+        out.board(board)
 
-        king_pos = get_king_pos(is_white_turn)
-        if is_king_in_check(is_white_turn, king_pos):
-            all_moves = king_moves(is_white_turn, king_pos)
-            if not all_moves: # Checkmate
+        all_moves = legal_moves(position)
+        if not all_moves:
+            if position.in_check(): # Checkmate
                 winner = "BLACK" if is_white_turn else "WHITE"
-                break
-        else:
-            all_moves = get_all_moves(is_white_turn) + king_moves(is_white_turn, king_pos)
-            if not all_moves: # Stalemate
+            else: # Stalemate
                 draw = True
-                break
+            break
 
-        print("WHITE plays" if is_white_turn else "BLACK plays")
+        out.ply("WHITE plays" if is_white_turn else "BLACK plays")
         
-        move = random.choice(all_moves)
-        curr_pos, next_pos = move
+        player = white if is_white_turn else black
+        curr_pos, next_pos, promotion = player(position, all_moves, seen)
         piece_moved = board[curr_pos[0]][curr_pos[1]]
         piece_captured = board[next_pos[0]][next_pos[1]]
 
         no_captures_moves = 0 if piece_captured != "." or piece_moved.lower() == "p" else no_captures_moves + 1
 
-        running = make_move(curr_pos, next_pos)
+        undo = position.make_move(curr_pos, next_pos, promotion)
+        if no_captures_moves == 0: # Irreversible, no earlier position can occur again
+            seen.clear()
+        seen[position.key] += 1
+        moves_made.append(move_name(undo.from_sq, undo.to_sq, undo.promotion))
+        running = undo.captured.lower() != "k"
         is_white_turn = not is_white_turn
-        print(curr_pos, next_pos)
-
-    display_board()
+        out.ply(curr_pos, next_pos)
 
     if draw:
-        print("Draw")
-    else:
-        if winner is None:
-            winner = "BLACK" if is_white_turn else "WHITE"
-        print(f"\n\n{winner} wins")
-
-    return None
-
-game()
\ No newline at end of file
+        winner = "DRAW"
+    elif winner is None:
+        winner = "BLACK" if is_white_turn else "WHITE"
+
+    out.final_board(board)
+    out.result("Draw" if draw else f"\n\n{winner} wins")
+
+    return GameResult(winner, len(moves_made), moves_made)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--verbosity", type=int, choices=[QUIET, RESULT, EVERY_PLY], default=EVERY_PLY,
+                        help="0: silent, 1: final board and result, 2: every ply")
+    parser.add_argument("--log", help="Write the output to this file instead of the terminal")
+    parser.add_argument("--white", choices=PLAYERS, default="random")
+    parser.add_argument("--black", choices=PLAYERS, default="random")
+    parser.add_argument("--time", type=float, default=0.5, help="Seconds per search move")
+    parser.add_argument("--nodes", type=int, default=None, help="Nodes per search move")
+    args = parser.parse_args()
+    white, white_searcher = make_player(args.white, args.time, args.nodes)
+    black, black_searcher = make_player(args.black, args.time, args.nodes)
+    sink = open_log(args.log) if args.log else None
+    game(verbosity=args.verbosity, sink=sink, white=white, black=black)
+    if sink:
+        sink.close()
+    for name, searcher in (("White", white_searcher), ("Black", black_searcher)):
+        if searcher:
+            print(f"{name} search: {searcher.summary()}")
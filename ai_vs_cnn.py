@@ -1,12 +1,19 @@
 """
 AI (Computer) plays a CNN model
-The both play randomly without any strategy
+The AI plays randomly without any strategy, unless --opponent search
 """
-import random
+import argparse
+import functools
+import os
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras import datasets, layers, models
 import time
+from bitboard import Position, SQUARES, START_FEN, from_fen, legal_moves
+from game_output import GameOutput, QUIET, RESULT, EVERY_PLY, open_log
+from encoder import FLIP, encode, encode_batch, label_indices, label_move
+from inference import InferenceServer
+from search import PLAYERS, make_player, random_player
 
 board = [
     ["R", "N", "B", "Q", "K", "B", "N", "R"],
@@ -19,34 +26,71 @@ board = [
     ["r", "n", "b", "q", "k", "b", "n", "r"],
 ]
 
-transformer = {
-    # Transforms board characters to numerical equivalents
-    # for prediction
-    "p": 1, "P": 15,
-    "r": 2, "R": 16,
-    "n": 3, "N": 17,
-    "b": 4, "B": 18,
-    "q": 5, "Q": 19,
-    "k": 7, "K": 21,
-    ".": 0
-}
-
-# Define the CNN architecture (this should be the same as the training architecture)
-input_layer = layers.Input(shape=(8, 8, 1))
-x = layers.Conv2D(32, (3, 3), activation='relu')(input_layer)
-x = layers.MaxPooling2D((2, 2))(x)
-x = layers.Conv2D(64, (3, 3), activation='relu')(x)
-x = layers.Flatten()(x)
-x = layers.Dense(64, activation='relu')(x)
-output1 = layers.Dense(8, activation='softmax', name='output1')(x)  # Coordinate 1
-output2 = layers.Dense(8, activation='softmax', name='output2')(x)  # Coordinate 2
-output3 = layers.Dense(8, activation='softmax', name='output3')(x)  # Coordinate 3
-output4 = layers.Dense(8, activation='softmax', name='output4')(x)  # Coordinate 4
-
-model = models.Model(inputs=input_layer, outputs=[output1, output2, output3, output4])
-
-# Load the saved weights
-model.load_weights('cnn_weights1.h5')
+position = Position(board) # Bitboards kept in step with board
+
+# Outcome is "WHITE", "BLACK" or "DRAW"
+# ranks holds the model's rank of every move the CNN played (see decode_move)
+CNNGameResult = namedtuple("CNNGameResult", ["outcome", "plies", "cnn_turns", "valid_predictions", "ranks"])
+
+WEIGHTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights")
+weights_file = "cnn_weights1.h5" # Changed with select_weights or --weights
+
+
+def list_weights():
+    """Finds the weight files available in the weights/ directory
+    Takes nothing and returns a sorted list of file names
+    """
+    return sorted(name for name in os.listdir(WEIGHTS_DIR) if name.endswith((".h5", ".npz")))
+
+def select_weights(name):
+    """Chooses the weights the CNN is loaded with
+    Takes a file name inside weights/ or a path to a weight file and returns None
+    """
+    global weights_file
+    path = name if os.path.exists(name) else os.path.join(WEIGHTS_DIR, name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No weight file {name}, available: {', '.join(list_weights())}")
+    weights_file = name
+    return None
+
+@functools.lru_cache(maxsize=None)
+def load_model(name):
+    """Builds the CNN and loads a weight file into it, once per weight file
+    An .npz file exported by numpy_model runs on NumPy alone. For an .h5
+    file TensorFlow is only imported here, so the rest of the module imports fast.
+    Takes a file name inside weights/ or a path and returns a model with a
+    Keras-like predict
+    """
+    path = name if os.path.exists(name) else os.path.join(WEIGHTS_DIR, name)
+    if path.endswith(".npz"):
+        import numpy_model
+        return numpy_model.load(path)
+
+    from tensorflow.keras import layers, models
+
+    # Define the CNN architecture (this should be the same as the training architecture)
+    input_layer = layers.Input(shape=(8, 8, 1))
+    x = layers.Conv2D(32, (3, 3), activation='relu')(input_layer)
+    x = layers.MaxPooling2D((2, 2))(x)
+    x = layers.Conv2D(64, (3, 3), activation='relu')(x)
+    x = layers.Flatten()(x)
+    x = layers.Dense(64, activation='relu')(x)
+    output1 = layers.Dense(8, activation='softmax', name='output1')(x)  # Coordinate 1
+    output2 = layers.Dense(8, activation='softmax', name='output2')(x)  # Coordinate 2
+    output3 = layers.Dense(8, activation='softmax', name='output3')(x)  # Coordinate 3
+    output4 = layers.Dense(8, activation='softmax', name='output4')(x)  # Coordinate 4
+
+    model = models.Model(inputs=input_layer, outputs=[output1, output2, output3, output4])
+
+    # Load the saved weights
+    model.load_weights(path)
+    return model
+
+def get_model():
+    """Returns the CNN with the selected weights, building it on first use
+    Takes nothing and returns a Keras model, or a NumpyModel for .npz weights
+    """
+    return load_model(weights_file)
 
 
 def display_board():
@@ -63,339 +107,300 @@ def pawn_moves(is_white_turn, curr_pos):
     Takes a tuple of integers curr_pos and a boolean is_white_turn and 
     returns a list of tuple of integers possible moves
     """
-    possible_moves = []
-    row, col = curr_pos
-    dxn = -1 if is_white_turn else 1 
-    next_row = row + dxn
-
-    if 0 <= next_row <= 7:
-        # Normal moves
-        if board[next_row][col] == '.':
-            possible_moves.append((next_row, col))
-            if (row == 6 and is_white_turn) or (row == 1 and not is_white_turn):
-                if board[next_row + dxn][col] == '.':
-                    possible_moves.append((next_row + dxn, col))
-                
-        # Attack moves
-        for attack_col in [col - 1, col + 1]:
-            if 0 <= attack_col <= 7:
-                if board[next_row][attack_col] != '.' and (board[next_row][attack_col].isupper() != board[row][col].isupper()):
-                    possible_moves.append((next_row, attack_col))
-
-    return possible_moves
+    return position.pawn_moves(is_white_turn, curr_pos)
 
 def rook_moves(curr_pos):
     """Finds and returns all possible moves a rook can make
     Takes a tuple of integers, curr_pos returns a list of tuple of integers, possible moves
     """
-    possible_moves = []
-    row, col = curr_pos
-
-    # Define directions: right, left, down, up
-    directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-
-    for dx, dy in directions:
-        temp_row, temp_col = row, col
-        while 0 <= temp_row + dx <= 7 and 0 <= temp_col + dy <= 7:
-            temp_row += dx
-            temp_col += dy
-            move = (temp_row, temp_col)
-            if board[temp_row][temp_col] == ".":  # Normal move
-                possible_moves.append(move)
-            else:
-                if board[row][col].isupper() != board[temp_row][temp_col].isupper():  # Attack move
-                    possible_moves.append(move)
-                break
-
-    return possible_moves
+    return position.rook_moves(curr_pos)
         
 def knight_moves(curr_pos):
     """Finds and returns all possible moves a knight can make
     Takes a tuple of integers, curr_pos returns a list of tuple of integers, possible moves
     """
-    possible_moves = []
-    row, col = curr_pos
-    changes = [2, -2, 1, -1]
-    for i in changes:
-        for j in changes:
-            if abs(i) == abs(j): # Not a valid move for knight
-                continue
-            if (row+i > 7 or row+i < 0) or (col+j > 7 or col+j < 0): # Out of board
-                continue
-            move = (row + i, col + j)
-            if (board[row+i][col+j] == ".") or (board[row][col].isupper() != board[row+i][col+j].isupper()):
-                possible_moves.append(move) # Normal or Attack move
-    
-    return possible_moves
+    return position.knight_moves(curr_pos)
         
 def bishop_moves(curr_pos):
     """Finds and returns all possible moves a bishop can make
     Takes a tuple of integers, curr_pos returns a list of tuple of integers, possible moves
     """
-    possible_moves = []
-    row, col = curr_pos
-
-    # Define diagonal directions: top-right, top-left, bottom-left, bottom-right
-    directions = [(-1, 1), (-1, -1), (1, -1), (1, 1)]
-
-    for dx, dy in directions:
-        temp_row, temp_col = row, col
-        while 0 <= temp_row + dx <= 7 and 0 <= temp_col + dy <= 7:
-            temp_row += dx
-            temp_col += dy
-            move = (temp_row, temp_col)
-            if board[temp_row][temp_col] == ".":  # Normal move
-                possible_moves.append(move)
-            else:
-                if board[row][col].isupper() != board[temp_row][temp_col].isupper():  # Attack move
-                    possible_moves.append(move)
-                break
-
-    return possible_moves
+    return position.bishop_moves(curr_pos)
 
 def queen_moves(curr_pos):
     """Finds and returns all possible moves a queen can make
     Takes a tuple of integers, curr_pos returns a list of tuple of integers, possible moves
     """
-    possible_moves = bishop_moves(curr_pos) + rook_moves(curr_pos)
-    return possible_moves
+    return position.queen_moves(curr_pos)
 
 def get_all_chars(is_white_turn):
     """Finds and returns the positions of all characters of a player
     Takes a boolean is_white_turn and returns a list of tuple of integers, characters
     """
-    characters = []
-    for i in range(8):
-        for j in range(8):
-            curr_char = board[i][j]
-            pos = (i, j)
-            if curr_char == ".":
-                continue
-            if is_white_turn:
-                if curr_char.islower():
-                    characters.append(pos)
-            else:
-                if curr_char.isupper():
-                    characters.append(pos)
-    return characters
+    return [SQUARES[sq] for sq in position.piece_squares(is_white_turn)]
 
 def get_all_moves(is_white_turn):
     """Gets and returns the possibles moves of all characters(except king) of a player
     Takes a boolean is_white_turn and returns a list of list of tuple of integers, all_moves
     """
-    all_characters = get_all_chars(is_white_turn)
-    all_moves = []
-    for pos in all_characters:
-        row, col = pos
-        char = board[row][col]
-        if char == "p" or char == "P":
-            all_moves += [[pos, new_pos] for new_pos in pawn_moves(is_white_turn, pos)]
-        elif char == "r" or char == "R":
-            all_moves += [[pos, new_pos] for new_pos in rook_moves(pos)]
-        elif char == "n" or char == "N":
-            all_moves += [[pos, new_pos] for new_pos in knight_moves(pos)]
-        elif char == "b" or char == "B" :
-            all_moves += [[pos, new_pos] for new_pos in bishop_moves(pos)]
-        elif char == "q" or char == "Q":
-            all_moves += [[pos, new_pos] for new_pos in queen_moves(pos)]
-                
-    return all_moves
+    return position.get_all_moves(is_white_turn)
 
 def get_king_pos(is_white_turn):
     """Get's the current positon of the king
     Takes boolean is_white_turn and returns a tuple of integers.
     """
-    king_type = "k" if is_white_turn else "K"
-    for i in range(8):
-        for j in range(8):
-            if board[i][j] == king_type:
-                return (i, j)
-    return (0, 0)
+    sq = position.king_square[is_white_turn]
+    return (0, 0) if sq is None else SQUARES[sq]
 
 def is_king_in_check(is_white_turn, curr_pos):
     """Returns True if the king of the current player is in check. Else it returns False.
     Takes boolean is_white_turn and tuple of integers curr_pos
     """
-    in_check = False
-    for pos in get_all_moves(not is_white_turn):
-        if pos[1] == curr_pos:
-            in_check = True
-            break
-        
-    if not in_check: # Check if there's an attacking enemy king
-        row, col = curr_pos
-        changes = [-1, 0, 1]
-        for i in changes:
-            for j in changes:
-                if (i == 0) and (j == 0):
-                    continue
-                if (row+i > 7 or row+i < 0) or (col+j > 7 or col-j < 0): # Out of board
-                    continue
-                if board[row+i][col+j].lower() == "k":
-                    in_check = True
-        
-    return in_check
-
-def reverse(prev_board):
-    """Reverses the board one move back
-    Takes a list of list of strings prev_board"""
-    for i in range(8):
-        for j in range(8):
-            board[i][j] = prev_board[i][j]
-    return None
+    return position.is_king_in_check(is_white_turn, curr_pos)
 
 def king_moves(is_white_turn, curr_pos):
     """Finds and returns all possible moves a king can make
     Takes a boolean is_white_turn and a tuple of integers curr_pos.
     """
-    row, col = curr_pos
-    changes = [-1, 0, 1]
-    possible_moves = []
-    for i in changes:
-        for j in changes:
-            if (i == 0) and (j == 0):
-                continue
-            if (row+i > 7 or row+i < 0) or (col+j > 7 or col+j < 0): # Out of board
-                continue
-            move = (row+i, col+j)
-            # Normal or Attack moves
-            if (board[row+i][col+j] == ".") or (board[row][col].isupper() != board[row+i][col+j].isupper()):
-                temp_board = [row.copy() for row in board] # Save a temporay version of the board
-                make_move(curr_pos, move) # Make a temporary move
-                if not is_king_in_check(is_white_turn, move): # Check if the king is safe after the temporary move
-                    possible_moves.append([curr_pos, move])
-                reverse(temp_board) # Reverse the temporary move
-                    
-    return possible_moves
+    return position.king_moves(is_white_turn, curr_pos)
 
 def make_move(curr_pos, next_pos):
     """Implements a move by replacing the character in next_pos by the character in curr_pos
     If the character that is replaced is a king, the function return False. Else it returns True
     Takes a list of tuple curr_pos and another list of typle next_pos and returns a boolean
     """
-    row0, col0 = curr_pos
-    row1, col1 = next_pos
-    char = board[row0][col0] # Get character at current position
-    attacked_char = board[row1][col1] # Get character at the position being attacked
-    
-    if char == "p" and (row0 != 0 and row1 == 0): # White-pawn promotion
-        char = random.choice(["n", "q", "b", "r"])
-    elif char == "P" and (row0 != 7 and row1 == 7): # Black-pawn promotion
-        char = random.choice(["N", "Q", "B", "R"])
-    
-    # Move character to new position
-    board[row1][col1] = char 
-    board[row0][col0] = "."
+    attacked_char = position.make_move(curr_pos, next_pos).captured
     
     if attacked_char.lower() == "k":
         return False
     else:
         return True
+
+def unmake_move():
+    """Reverses the board one move back
+    Takes nothing and returns None
+    """
+    position.unmake_move()
+    return None
   
 def get_data_point(is_white_turn):
     """Transforms the current state of the board into number
     representatives to allow for prediction.
-    Takes nothing and returns an 8*8 numpy array
+    Takes a boolean is_white_turn and returns an 8*8 numpy array
     """
-    data = []
-    if is_white_turn:
-        for i in range(8):
-            data.append([transformer[ele] for ele in board[i]])
-    else:
-        for i in range(8):
-            data.append(list(reversed([transformer[ele.upper()] if ele.islower() else transformer[ele.lower()] for ele in board[i]])))
-        data.reverse()
-    
-    data = np.array(data)
-    print(data)
-    return data
+    return encode(position.codes, is_white_turn)
 
 def predict_move(data_point):
-    # Assuming data_point is a preprocessed 8x8 matrix
-    # Reshape and preprocess as required
-    data_point = np.expand_dims(data_point, axis=0)  # Reshape to (1, 8, 8, 1) for the model
+    """Predicts the label of a move from one encoded board
+    Takes an 8*8 numpy array and returns a list of 4 integers
+    """
+    return list(predict_moves(data_point[None])[0])
+
+def predict_moves(data_points):
+    """Predicts move labels for a batch of encoded boards in one forward pass
+    Takes an (n, 8, 8) numpy array and returns an (n, 4) numpy array of integers
+    """
+    # Convert predictions from one-hot encoded vectors to integer coordinates
+    return np.argmax(predict_probabilities(data_points), axis=2)
+
+def predict_probabilities(data_points):
+    """Runs the CNN over a batch of encoded boards in one forward pass
+    Takes an (n, 8, 8) numpy array and returns an (n, 4, 8) numpy array, the
+    softmax output of each of the 4 heads
+    """
+    data_points = np.expand_dims(data_points, axis=-1)  # Reshape to (n, 8, 8, 1) for the model
 
     # Make a prediction
-    predictions = model.predict(data_point)
+    predictions = get_model().predict(data_points, verbose=0)
+    return np.stack(predictions, axis=1)
 
-    # Convert predictions from one-hot encoded vectors to integer coordinates
-    predicted_coordinates = [np.argmax(pred) for pred in predictions]
+def predict_probability(data_point):
+    """Runs the CNN over one encoded board
+    Takes an 8*8 numpy array and returns a (4, 8) numpy array of head probabilities
+    """
+    return predict_probabilities(data_point[None])[0]
+
+def predict_board(board):
+    """Encodes one board and runs the CNN over it
+    Takes a tuple (64 ASCII bytes of a board, boolean is_white_turn) and
+    returns a (4, 8) numpy array of head probabilities
+    """
+    return predict_probability(encode(*board))
 
-    return predicted_coordinates
+def encode_boards(boards):
+    """Encodes the boards gathered into a batch by an InferenceServer in one call
+    Takes a list of tuples (64 ASCII bytes of a board, boolean is_white_turn)
+    and returns an (n, 8, 8) int8 numpy array
+    """
+    return encode_batch([codes for codes, _ in boards], [is_white_turn for _, is_white_turn in boards])
+
+def move_labels(moves, is_white_turn):
+    """Turns a list of moves into integer labels, as seen by the player to move
+    Takes a list of list of tuple of integers and a boolean is_white_turn and
+    returns an (n,) numpy array of integers (see encoder.move_label)
+    """
+    moves = np.array([(from_row * 8 + from_col) << 6 | to_row * 8 + to_col
+                      for (from_row, from_col), (to_row, to_col) in moves])
+    return moves if is_white_turn else moves ^ FLIP
+
+def decode_move(probabilities, moves, is_white_turn=True):
+    """Picks the legal move the CNN finds most likely
+    A move scores the joint log-probability of its label, the sum over the
+    4 heads of the log-probability each gives its coordinate. The rank of
+    the chosen move among all 8**4 labels is 1 when the head-by-head argmax
+    is legal, and counts how many illegal labels the model preferred otherwise.
+    Takes a (4, 8) numpy array of head probabilities, a list of legal moves
+    and a boolean is_white_turn and returns a tuple (move, rank)
+    """
+    log_probs = np.log(np.maximum(probabilities, 1e-12)) # Keep log(0) finite
+
+    # Joint log-probability of every one of the 8**4 labels, indexed by integer label
+    joint = (log_probs[0][:, None, None, None] + log_probs[1][:, None, None] + log_probs[2][:, None] + log_probs[3]).ravel()
+    scores = joint[move_labels(moves, is_white_turn)]
+    best = int(np.argmax(scores))
+    rank = int(np.count_nonzero(joint > scores[best])) + 1
+    return moves[best], rank
 
 
 def label_to_move(label):
     """Transforms a label to move that can be implemented on the chess board
     Takes a list of integers and returns a list of tuple of integers
     """
-    curr_pos = label[0], label[1]
-    next_pos = label[2], label[3]
-    move = [curr_pos, next_pos]
-    return move
+    move = label_move(int(label_indices(label)), True)
+    return [SQUARES[move >> 6], SQUARES[move & 63]]
 
 # Main game loop
-def game(): 
-    is_white_turn = True  # White starts
+def game(position=position, verbosity=EVERY_PLY, sink=None, predict=None, delay=8, opponent=random_player):
+    """Plays one game from position, which defaults to the module's board
+    Takes a Position, an integer verbosity (see game_output), an optional
+    file-like sink for the output, an optional predict function from a
+    tuple (board bytes, is_white_turn) to its (4, 8) head probabilities
+    (predict_board by default, or the predict of a shared InferenceServer
+    that encodes its batches with encode_boards) and the seconds to
+    wait before every ply (0 to not wait) and the player of black (see
+    search) and returns a CNNGameResult
+    """
+    out = GameOutput(verbosity, sink)
+    predict = predict or predict_board
+    board = position.board
+    is_white_turn = position.is_white_turn
     running, draw = True, False
     winner = None
     no_captures_moves = 0  # Moves made without any captures or pawn movements
-    counter = 0 # Count the number of turns the cnn has played
+    seen = Counter([position.key]) # Times each position occurred since the last capture or pawn move
+    plies, cnn_turns = 0, 0
+    counter = 0 # Count the number of turns the cnn's own top label was legal
+    ranks = []
 
     while running:
-        time.sleep(8)
+        if delay:
+            time.sleep(delay)
         if no_captures_moves >= 100:  # Draw by fifty-move rule
             draw = True
             break
+        if seen[position.key] >= 3: # Draw by threefold repetition
+            draw = True
+            break
         
-        display_board()
+        out.board(board)
 
-        king_pos = get_king_pos(is_white_turn)
-        if is_king_in_check(is_white_turn, king_pos):
-            all_moves = king_moves(is_white_turn, king_pos)
-            if not all_moves: # Checkmate
+        all_moves = legal_moves(position)
+        if not all_moves:
+            if position.in_check(): # Checkmate
                 winner = "BLACK" if is_white_turn else "WHITE"
-                break
-        else:
-            all_moves = get_all_moves(is_white_turn) + king_moves(is_white_turn, king_pos)
-            if not all_moves: # Stalemate
+            else: # Stalemate
                 draw = True
-                break
+            break
             
-        print("CNN (white) plays" if is_white_turn else "AI (black) plays")
+        out.ply("CNN (white) plays" if is_white_turn else "AI (black) plays")
         
         if is_white_turn: # CNN plays
-            prediction = predict_move(get_data_point(is_white_turn))
-            move = label_to_move(prediction)
-            print(move)
-            if move in all_moves:
+            if out.verbosity >= EVERY_PLY:
+                out.ply(encode(position.codes, is_white_turn))
+            probabilities = predict((bytes(position.codes), is_white_turn))
+            move, rank = decode_move(probabilities, all_moves, is_white_turn)
+            out.ply(move, "rank", rank)
+            cnn_turns += 1
+            ranks.append(rank)
+            if rank == 1: # The heads' own argmax label is legal
                 counter += 1
-            else:
-                print("Invalid move predicted")
-                move = random.choice(all_moves)
+            curr_pos, next_pos = move
+            promotion = None
         else: # AI plays
-            move = random.choice(all_moves)
+            curr_pos, next_pos, promotion = opponent(position, all_moves, seen)
             
-        curr_pos, next_pos = move
         piece_moved = board[curr_pos[0]][curr_pos[1]]
         piece_captured = board[next_pos[0]][next_pos[1]]
         
         no_captures_moves = 0 if piece_captured != "." or piece_moved.lower() == "p" else no_captures_moves + 1
 
-        running = make_move(curr_pos, next_pos)
+        running = position.make_move(curr_pos, next_pos, promotion).captured.lower() != "k"
+        if no_captures_moves == 0: # Irreversible, no earlier position can occur again
+            seen.clear()
+        seen[position.key] += 1
         is_white_turn = not is_white_turn
-        print(curr_pos, next_pos)
-
-    display_board()
+        plies += 1
+        out.ply(curr_pos, next_pos)
 
     if draw:
-        print("Draw")
+        winner = "DRAW"
+    elif winner is None:
+        winner = "BLACK" if is_white_turn else "WHITE"
+
+    out.final_board(board)
+    out.result("Draw" if draw else f"\n\n{winner} wins")
+    out.result("NUMBER OF CNN TURNS: ", counter)
+    return CNNGameResult(winner, plies, cnn_turns, counter, ranks)
+
+
+def evaluate(games, concurrency=32, max_batch_size=64, max_wait=0.005, opponent="random", time_limit=0.5):
+    """Plays many silent games without delay, batching the CNN's forward passes across them
+    Every game runs in its own thread on its own Position, and all of them
+    share one InferenceServer, which encodes each batch of boards in one call.
+    Takes the integer number of games, the integer number of games played
+    at once, the batching limits and the name of the opponent (see
+    search.PLAYERS) with its seconds per search move and returns a tuple (list of
+    CNNGameResult, seconds taken, mean batch size)
+    """
+    start = time.perf_counter()
+    with InferenceServer(predict_probabilities, max_batch_size, max_wait, collate=encode_boards) as server:
+        def play(_):
+            player, _ = make_player(opponent, time_limit) # A Searcher per game, they are not shared across threads
+            return game(from_fen(START_FEN), QUIET, predict=server.predict, delay=0, opponent=player)
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(play, range(games)))
+    return results, time.perf_counter() - start, server.mean_batch_size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--verbosity", type=int, choices=[QUIET, RESULT, EVERY_PLY], default=EVERY_PLY,
+                        help="0: silent, 1: final board and result, 2: every ply")
+    parser.add_argument("--log", help="Write the output to this file instead of the terminal")
+    parser.add_argument("--delay", type=float, default=8, help="Seconds to wait before every ply (0: no wait)")
+    parser.add_argument("--weights", default=weights_file, help="Weight file in weights/ or a path to one")
+    parser.add_argument("--games", type=int, default=1, help="More than 1 evaluates the CNN over silent games")
+    parser.add_argument("--concurrency", type=int, default=32, help="Games played at once when evaluating")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait", type=float, default=0.005, help="Seconds a board may wait for a batch to fill")
+    parser.add_argument("--opponent", choices=PLAYERS, default="random")
+    parser.add_argument("--time", type=float, default=0.5, help="Seconds per search move of the opponent")
+    args = parser.parse_args()
+    select_weights(args.weights)
+
+    if args.games > 1:
+        results, seconds, mean_batch_size = evaluate(args.games, args.concurrency, args.max_batch_size, args.max_wait,
+                                                   args.opponent, args.time)
+        ranks = np.array([rank for result in results for rank in result.ranks])
+        print(f"Games: {len(results)} in {seconds:.1f}s ({len(results) / seconds:.1f} games/s)")
+        print(f"CNN moves: {len(ranks)}, all legal after masking")
+        for k in (1, 5, 10, 100):
+            print(f"Played move in the top {k}: {np.mean(ranks <= k) if len(ranks) else 0:.1%}")
+        print(f"Mean rank: {ranks.mean() if len(ranks) else 0:.1f}")
+        print(f"Mean batch size: {mean_batch_size:.1f}")
     else:
-        if winner is None:
-            winner = "BLACK" if is_white_turn else "WHITE"
-        print(f"\n\n{winner} wins")
-
-    print("NUMBER OF CNN TURNS: ", counter)
-    return None
-
-
-game()
\ No newline at end of file
+        sink = open_log(args.log) if args.log else None
+        opponent, _ = make_player(args.opponent, args.time)
+        game(verbosity=args.verbosity, sink=sink, delay=args.delay, opponent=opponent)
+        if sink:
+            sink.close()
@@ -0,0 +1,533 @@
+"""
+Benchmarks for the game engine
+Every benchmark is a subcommand, eg.
+
+    python benchmarks.py verbosity --games 50
+"""
+import argparse
+import io
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import bitboard
+from bitboard import SQUARES, START_FEN, Position, from_fen, legal_moves, move_name
+from encoder import encode
+from game_output import QUIET, RESULT, EVERY_PLY
+import ai_vs_ai
+import collect
+import numpy_model
+import self_play
+from perft import SUITE
+from search import Searcher
+
+
+def play_games(games, verbosity, sink, seed=0):
+    """Plays seeded ai_vs_ai games and measures them
+    Takes the integer number of games, an integer verbosity, a file-like sink
+    and an integer seed and returns a tuple (games per second, plies per second)
+    """
+    plies = 0
+    start = time.perf_counter()
+    for game_seed in range(seed, seed + games):
+        random.seed(game_seed)
+        plies += ai_vs_ai.game(from_fen(START_FEN), verbosity, sink).plies
+    seconds = time.perf_counter() - start
+    return games / seconds, plies / seconds
+
+
+def bench_verbosity(args):
+    """Compares games per second with the output silenced, buffered and written line by line
+    The line-buffered run writes to the null device one line at a time, like
+    a terminal does, so it measures the write calls without the cost of
+    drawing on screen. --terminal adds a run that really prints to stdout.
+    """
+    play_games(1, QUIET, None) # Warm up
+    with open(os.devnull, "w", buffering=1) as line_buffered:
+        runs = [
+            ("quiet", QUIET, None),
+            ("result only", RESULT, io.StringIO()),
+            ("every ply, in memory", EVERY_PLY, io.StringIO()),
+            ("every ply, line-buffered", EVERY_PLY, line_buffered),
+        ]
+        if args.terminal:
+            runs.append(("every ply, terminal", EVERY_PLY, sys.stdout))
+        report = []
+        for name, verbosity, sink in runs:
+            games_per_second, plies_per_second = play_games(args.games, verbosity, sink)
+            report.append(f"{name:<26} {games_per_second:8.2f} games/s {plies_per_second:10,.0f} plies/s")
+    print("\n".join(report))
+    return None
+
+
+# VmHWM is the peak resident memory of this process alone. ru_maxrss is not
+# used, as it carries over the peak of the process that forked the probe.
+IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+with open("/proc/self/status") as f:
+    peak_kb = next(line.split()[1] for line in f if line.startswith("VmHWM:"))
+print(seconds, peak_kb, "tensorflow" in sys.modules)
+"""
+
+
+def bench_imports(args):
+    """Times importing each entry point in a fresh interpreter
+    Also reports the peak memory of that interpreter and whether the import
+    pulled in TensorFlow.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    print(f"{'module':<26} {'import':>9} {'peak RSS':>10}  TensorFlow")
+    for module in args.modules:
+        times = []
+        for _ in range(args.repeat):
+            output = subprocess.run([sys.executable, "-c", IMPORT_PROBE.format(module=module)], cwd=here,
+                                    capture_output=True, text=True, check=True).stdout.split()
+            times.append(float(output[0]))
+        peak_mb = int(output[1]) / 1024 # VmHWM is in kilobytes
+        print(f"{module:<26} {statistics.median(times) * 1000:7.1f}ms {peak_mb:8.1f}MB  {'loaded' if output[2] == 'True' else 'not loaded'}")
+    return None
+
+
+def bench_repetition(args):
+    """Compares self-play with and without the threefold-repetition draw
+    Both runs play the same seeds, so every game is the same until its
+    first threefold repetition. After a short warm-up of both, the runs
+    take turns going first for --rounds rounds, and each keeps its fastest
+    time, so neither pays for starting up alone.
+    """
+    modes = [("played on", False), ("threefold draw", True)]
+    for _, repetitions in modes: # Warm up
+        self_play.run(min(args.games, 10), args.workers, args.seed, repetitions)
+    fastest = {name: (None, float("inf")) for name, _ in modes} # Results and fastest time of each mode
+    for round_index in range(args.rounds):
+        for name, repetitions in modes[::-1] if round_index % 2 else modes:
+            results, seconds = self_play.run(args.games, args.workers, args.seed, repetitions)
+            fastest[name] = results, min(fastest[name][1], seconds)
+
+    report = []
+    for name, _ in modes:
+        results, seconds = fastest[name]
+        plies = [result.plies for result in results]
+        draws = sum(result.outcome == "DRAW" for result in results)
+        report.append((name, statistics.mean(plies), draws, seconds))
+        print(f"{name:<16} {statistics.mean(plies):7.1f} plies/game {draws / len(results):6.1%} draws "
+              f"{seconds:7.2f}s ({len(results) / seconds:.1f} games/s)")
+    before, after = report[0][1], report[1][1]
+    print(f"Average game length drops by {before - after:.1f} plies ({(before - after) / before:.1%}), "
+          f"time by {(report[0][3] - report[1][3]) / report[0][3]:.1%} (fastest of {args.rounds} rounds)")
+    return None
+
+
+def bench_collect(args):
+    """Measures how collection throughput scales with the number of worker processes
+    Every run collects one shard per worker into a fresh temporary
+    directory, so each worker does the same amount of work.
+    """
+    print(f"{'workers':>7} {'samples':>10} {'seconds':>8} {'samples/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as directory:
+            entries, seconds = collect.run(directory, workers, workers, args.seed, args.games)
+        samples = sum(entry["samples"] for entry in entries)
+        baseline = baseline or samples / seconds
+        print(f"{workers:7} {samples:10,} {seconds:8.2f} {samples / seconds:10,.0f} {samples / seconds / baseline:7.1f}x")
+    return None
+
+
+def bench_search(args):
+    """Searches the perft reference positions under a fixed budget
+    Reports the depth every search completed and its speed, which is what
+    decides how strong the search player is at a given time per move.
+    """
+    print(f"{'position':<18} {'move':>6} {'depth':>5} {'nodes':>9} {'seconds':>8} {'nodes/s':>9}")
+    searcher = Searcher(None if args.nodes else args.time, args.nodes)
+    for name, fen, _ in SUITE:
+        result = searcher.search(from_fen(fen))
+        print(f"{name:<18} {move_name(*result.move):>6} {result.depth:5} {result.nodes:9,} "
+              f"{result.seconds:8.2f} {result.nodes_per_second:9,.0f}")
+    print(searcher.summary())
+    return None
+
+
+def bench_table(args):
+    """Searches the perft positions to a fixed depth with transposition tables of several sizes
+    One Searcher, and so one table, goes through all the positions, like a
+    player through the moves of a game. Size 0 searches without a table.
+    """
+    print(f"{'size':>8} {'nodes':>10} {'seconds':>8} {'hit rate':>9} {'collisions':>11} {'overwrites':>11} {'full':>6}")
+    for megabytes in args.sizes:
+        searcher = Searcher(None, None, args.depth, megabytes)
+        start = time.perf_counter()
+        nodes = sum(searcher.search(from_fen(fen)).nodes for _, fen, _ in SUITE)
+        seconds = time.perf_counter() - start
+        table = searcher.table
+        if table is None:
+            print(f"{'none':>8} {nodes:10,} {seconds:8.2f}")
+        else:
+            print(f"{megabytes:6g}MB {nodes:10,} {seconds:8.2f} {table.hit_rate():9.1%} {table.collisions:11,} "
+                  f"{table.overwrites:11,} {table.fill():6.1%}")
+    return None
+
+
+def bench_ordering(args):
+    """Searches the perft positions to a fixed depth with and without move ordering
+    Both searches return the same scores, so fewer nodes means more pruning.
+    """
+    print(f"{'ordering':<12} {'nodes':>10} {'seconds':>8} {'nodes/s':>9}")
+    report = []
+    for name, ordering in (("scan order", False), ("staged", True)):
+        searcher = Searcher(None, None, args.depth, args.table, ordering)
+        start = time.perf_counter()
+        nodes = sum(searcher.search(from_fen(fen)).nodes for _, fen, _ in SUITE)
+        seconds = time.perf_counter() - start
+        report.append((nodes, seconds))
+        print(f"{name:<12} {nodes:10,} {seconds:8.2f} {nodes / seconds:9,.0f}")
+    (nodes_before, seconds_before), (nodes_after, seconds_after) = report
+    print(f"Nodes cut by {1 - nodes_after / nodes_before:.1%}, time by {1 - seconds_after / seconds_before:.1%}")
+    return None
+
+
+# Tactical positions in standard FEN with the moves that solve them, or with
+# "!" before the moves, the tempting ones that lose
+TACTICS = [
+    ("Hanging queen", "4k3/8/8/3q4/8/8/3R4/3K4 w - - 0 1", ["d2d5"]),
+    ("Rook for queen", "3qk3/8/8/8/8/8/8/3RK3 w - - 0 1", ["d1d8"]),
+    ("Knight fork", "r3k3/8/8/1N6/8/8/8/4K3 w - - 0 1", ["b5c7"]),
+    ("Back-rank mate", "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1", ["d1d8"]),
+    ("Promotion", "8/4P3/5k2/8/8/8/8/4K3 w - - 0 1", ["e7e8q"]),
+    ("Poisoned knight", "4k3/8/4p3/3n4/8/8/8/3QK3 w - - 0 1", ["!", "d1d5"]),
+    ("Defended pawn", "4k3/8/2p5/3p4/8/8/3Q4/4K3 w - - 0 1", ["!", "d2d5"]),
+    ("Kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w - - 0 1", ["e2a6", "d5e6"]),
+]
+
+
+def solves(move, answers):
+    """Checks a move against the answers of a TACTICS position
+    Takes a string move name and a list of strings and returns a boolean
+    """
+    if answers[0] == "!":
+        return move not in answers[1:]
+    return move in answers
+
+
+def bench_quiescence(args):
+    """Searches a tactical suite to a fixed depth with and without quiescence search
+    Plain alpha-beta evaluates its leaves as they stand, so a capture just
+    before the horizon looks free even when the piece is recaptured.
+    """
+    configs = [
+        ("plain", dict(quiescence=False)),
+        ("quiescence", dict(exchange_pruning=False)),
+        ("quiescence+SEE", dict()),
+    ]
+    print(f"{'search':<16} {'solved':>7} {'nodes':>9} {'seconds':>8}  moves")
+    for name, options in configs:
+        solved = nodes = 0
+        moves = []
+        start = time.perf_counter()
+        for _, fen, answers in TACTICS:
+            searcher = Searcher(None, None, args.depth, **options)
+            result = searcher.search(from_fen(fen))
+            move = move_name(*result.move)
+            solved += solves(move, answers)
+            nodes += result.nodes
+            moves.append(move)
+        seconds = time.perf_counter() - start
+        print(f"{name:<16} {solved:3}/{len(TACTICS):<3} {nodes:9,} {seconds:8.2f}  {' '.join(moves)}")
+    return None
+
+
+def sample_positions(count, seed=0):
+    """Collects the positions met in random games
+    Takes an integer count and an integer seed and returns a list of Positions
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = from_fen(START_FEN)
+        for _ in range(200):
+            moves = position.generate_legal()
+            if not moves or len(positions) == count:
+                break
+            positions.append(Position([row[:] for row in position.board], position.is_white_turn))
+            from_sq, to_sq = rng.choice(moves)
+            promotions = position.promotions(from_sq, to_sq)
+            position.push(from_sq, to_sq, rng.choice(promotions) if len(promotions) > 1 else None)
+    return positions
+
+
+def sample_boards(count, seed=0):
+    """Encodes the positions met in random games, as the CNN sees them
+    Takes an integer count and an integer seed and returns a (count, 8, 8)
+    int8 numpy array
+    """
+    return np.stack([encode(position.codes, position.is_white_turn) for position in sample_positions(count, seed)])
+
+
+SHARED = {id(square) for square in SQUARES} # Tuples every move list points to instead of allocating
+
+
+def held_bytes(moves):
+    """Adds up the memory the objects of a move list take
+    Every list, tuple and large integer is counted once. Small integers and
+    the shared SQUARES tuples are left out, as no move generator allocates them.
+    Takes a move list, or any other result, and returns an integer
+    """
+    seen, total, stack = set(), 0, [moves]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or id(item) in SHARED or type(item) is bool or type(item) is int and -5 <= item <= 256:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return total
+
+
+def bench_moves(args):
+    """Compares the list-building move generators with the lazy iter_moves
+    Every generator runs once on each position met in random games. The
+    time is the best of --repeat untraced runs. The peak is the most memory tracemalloc
+    saw in use during a call, the held memory what the returned moves take
+    (see held_bytes). get_all_moves leaves out the king and does not check
+    legality, it is shown as the baseline the game scripts started from.
+    """
+    positions = sample_positions(args.positions, args.seed)
+    generators = [
+        ("get_all_moves", lambda position: position.get_all_moves(position.is_white_turn)),
+        ("legal_moves", legal_moves),
+        ("generate_legal", lambda position: position.generate_legal()),
+        ("list(iter_moves)", lambda position: list(position.iter_moves())),
+        ("has_legal_move", lambda position: position.has_legal_move()),
+    ]
+    print(f"{'generator':<18} {'time/ply':>10} {'peak/ply':>10} {'held/ply':>10}")
+    for name, generate in generators:
+        seconds = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for position in positions:
+                generate(position)
+            seconds = min(seconds, time.perf_counter() - start)
+
+        peak = held = 0
+        tracemalloc.start()
+        for position in positions:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            moves = generate(position)
+            peak += tracemalloc.get_traced_memory()[1] - before
+            held += held_bytes(moves)
+            del moves
+        tracemalloc.stop()
+        print(f"{name:<18} {seconds / len(positions) * 1e6:8.1f}us {peak / len(positions):9,.0f}B "
+              f"{held / len(positions):9,.0f}B")
+    return None
+
+
+def stepping_attacks(sq, directions, occupied):
+    """Finds the squares a sliding piece on sq attacks by stepping one square at a time
+    The way bitboard.slider_attacks worked before its ray tables, kept as
+    the baseline for bench_sliders.
+    Takes an integer sq, a list of tuple of integers directions and an
+    integer occupied and returns a bitboard
+    """
+    row, col = SQUARES[sq]
+    attacks = 0
+    for dx, dy in directions:
+        temp_row, temp_col = row + dx, col + dy
+        while 0 <= temp_row <= 7 and 0 <= temp_col <= 7:
+            bit = 1 << (temp_row * 8 + temp_col)
+            attacks |= bit
+            if occupied & bit:
+                break
+            temp_row += dx
+            temp_col += dy
+    return attacks
+
+
+def bench_sliders(args):
+    """Times the attacks of every rook, bishop and queen met in random games
+    Compares stepping square by square, cutting precomputed rays at their
+    first blocker and looking the attacks up by the occupancy of the relevant
+    squares. The lookup tables start empty, so they are timed twice: while
+    they fill and once they are warm.
+    """
+    positions = sample_positions(args.positions, args.seed)
+    for table in bitboard.ROOK_TABLE + bitboard.BISHOP_TABLE:
+        table.clear()
+    print(f"{'piece':<8} {'squares':>8} {'stepping':>10} {'rays':>10} {'cold table':>11} {'table':>10}")
+    for name, chars, directions, lookup in (
+        ("rook", "rR", bitboard.ROOK_DIRECTIONS, bitboard.rook_attacks),
+        ("bishop", "bB", bitboard.BISHOP_DIRECTIONS, bitboard.bishop_attacks),
+        ("queen", "qQ", bitboard.BISHOP_DIRECTIONS + bitboard.ROOK_DIRECTIONS, bitboard.queen_attacks),
+    ):
+        pieces = [(sq, position.occupied) for position in positions
+                  for sq in bitboard.squares_of(position.pieces[chars[0]] | position.pieces[chars[1]])]
+
+        def per_piece(attacks_of, repeat):
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for sq, occupied in pieces:
+                    attacks_of(sq, occupied)
+                best = min(best, time.perf_counter() - start)
+            return best / len(pieces) * 1e9
+
+        for sq, occupied in pieces:
+            expected = stepping_attacks(sq, directions, occupied)
+            if bitboard.slider_attacks(sq, directions, occupied) != expected:
+                raise AssertionError(f"rays disagree with stepping for the {name} on {bitboard.square_name(sq)}")
+        stepping = per_piece(lambda sq, occupied: stepping_attacks(sq, directions, occupied), args.repeat)
+        rays = per_piece(lambda sq, occupied: bitboard.slider_attacks(sq, directions, occupied), args.repeat)
+        cold = per_piece(lookup, 1)
+        warm = per_piece(lookup, args.repeat)
+        if any(lookup(sq, occupied) != stepping_attacks(sq, directions, occupied) for sq, occupied in pieces):
+            raise AssertionError(f"the {name} table disagrees with stepping")
+        print(f"{name:<8} {len(pieces):8,} {stepping:8.0f}ns {rays:8.0f}ns {cold:9.0f}ns {warm:8.0f}ns")
+    entries = sum(map(len, bitboard.ROOK_TABLE)), sum(map(len, bitboard.BISHOP_TABLE))
+    print(f"Table entries filled: {entries[0]:,} rook, {entries[1]:,} bishop")
+    return None
+
+
+def time_predictions(model, boards, batch_size, seconds=1.0):
+    """Measures the latency of single-board predictions and the throughput of batches
+    Takes a model with a Keras-like predict, an (n, 8, 8) numpy array, an
+    integer batch_size and the seconds to spend on each measure and returns
+    a tuple (median microseconds per single board, boards per second in batches)
+    """
+    boards = np.expand_dims(boards, axis=-1)
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        board = boards[len(latencies) % len(boards)][None]
+        start = time.perf_counter()
+        model.predict(board, verbose=0)
+        latencies.append(time.perf_counter() - start)
+
+    predicted = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        offset = predicted % len(boards)
+        predicted += len(model.predict(boards[offset:offset + batch_size], verbose=0)[0])
+    return statistics.median(latencies) * 1e6, predicted / (time.perf_counter() - start)
+
+
+def bench_cnn(args):
+    """Compares the Keras CNN with its NumPy and int8 NumPy forward passes
+    Times a single-board prediction and batches of --batch-size boards, then
+    checks how closely each forward pass agrees with the others. Keras is
+    skipped when TensorFlow is not installed.
+    """
+    import ai_vs_cnn
+
+    if args.dataset:
+        from dataset import load
+        boards = np.array(load(args.dataset)[0][:args.boards])
+    else:
+        boards = sample_boards(args.boards)
+    weights = numpy_model.read_h5(os.path.join(ai_vs_cnn.WEIGHTS_DIR, args.weights))
+    models = {"numpy": numpy_model.NumpyModel(weights), "numpy int8": numpy_model.NumpyModel(numpy_model.quantize(weights))}
+    try:
+        models["keras"] = ai_vs_cnn.load_model(args.weights)
+    except ImportError:
+        print("TensorFlow is not installed, Keras is skipped\n")
+
+    print(f"{'model':<12} {'latency':>10} {'throughput':>16}")
+    for name, model in models.items():
+        latency, throughput = time_predictions(model, boards, args.batch_size, args.seconds)
+        print(f"{name:<12} {latency:8.0f}us {throughput:10,.0f} boards/s")
+
+    print(f"\nParity over {len(boards)} boards")
+    pairs = [("numpy int8", "numpy")] + [(name, "keras") for name in ("numpy", "numpy int8") if "keras" in models]
+    for candidate, reference in pairs:
+        result = numpy_model.parity(models[reference], models[candidate], boards)
+        print(f"{candidate} vs {reference}: max |diff| {result.max_abs_diff:.2e}, "
+              f"heads agree {result.head_agreement:.1%}, labels agree {result.label_agreement:.1%}")
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the game engine")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    verbosity = subparsers.add_parser("verbosity", help="Games per second in quiet and verbose modes")
+    verbosity.add_argument("--games", type=int, default=20)
+    verbosity.add_argument("--terminal", action="store_true", help="Also time a run printing to the terminal")
+    verbosity.set_defaults(run=bench_verbosity)
+
+    imports = subparsers.add_parser("imports", help="Import time and memory of each entry point")
+    imports.add_argument("--repeat", type=int, default=5, help="Imports timed per module, the median is shown")
+    imports.add_argument("--modules", nargs="+", default=[
+        "bitboard", "perft", "ai_vs_ai", "self_play", "human_vs_ai",
+        "encoder", "dataset", "collecting_training_data", "ai_vs_cnn", "numpy_model", "search", "collect",
+    ])
+    imports.set_defaults(run=bench_imports)
+
+    repetition = subparsers.add_parser("repetition", help="Self-play game length with and without threefold repetition")
+    repetition.add_argument("--games", type=int, default=200)
+    repetition.add_argument("--workers", type=int, default=None, help="Worker processes (default: number of cores)")
+    repetition.add_argument("--seed", type=int, default=0)
+    repetition.add_argument("--rounds", type=int, default=3, help="Timed runs of each mode, the fastest is shown")
+    repetition.set_defaults(run=bench_repetition)
+
+    collection = subparsers.add_parser("collect", help="Training data collected per second at several worker counts")
+    collection.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    collection.add_argument("--games", type=int, default=5, help="Games per worker")
+    collection.add_argument("--seed", type=int, default=0)
+    collection.set_defaults(run=bench_collect)
+
+    search = subparsers.add_parser("search", help="Depth and speed of the search on the perft positions")
+    search.add_argument("--time", type=float, default=1.0, help="Seconds per search")
+    search.add_argument("--nodes", type=int, default=None, help="Nodes per search instead of a time limit")
+    search.set_defaults(run=bench_search)
+
+    table = subparsers.add_parser("table", help="Nodes and hit rate of the search at several transposition table sizes")
+    table.add_argument("--depth", type=int, default=4)
+    table.add_argument("--sizes", type=float, nargs="+", default=[0, 0.01, 0.1, 1, 4, 16], help="Megabytes")
+    table.set_defaults(run=bench_table)
+
+    ordering = subparsers.add_parser("ordering", help="Nodes searched at a fixed depth with and without move ordering")
+    ordering.add_argument("--depth", type=int, default=4)
+    ordering.add_argument("--table", type=float, default=4, help="Megabytes of transposition table (0: none)")
+    ordering.set_defaults(run=bench_ordering)
+
+    quiescence = subparsers.add_parser("quiescence", help="Tactical suite with and without quiescence search")
+    quiescence.add_argument("--depth", type=int, default=2)
+    quiescence.set_defaults(run=bench_quiescence)
+
+    moves = subparsers.add_parser("moves", help="Time and memory per ply of each move generator")
+    moves.add_argument("--positions", type=int, default=2000, help="Positions from random games")
+    moves.add_argument("--seed", type=int, default=0)
+    moves.add_argument("--repeat", type=int, default=5, help="Timed runs per generator, the fastest is shown")
+    moves.set_defaults(run=bench_moves)
+
+    sliders = subparsers.add_parser("sliders", help="Rook, bishop and queen attacks: stepping, rays and lookup tables")
+    sliders.add_argument("--positions", type=int, default=2000, help="Positions from random games")
+    sliders.add_argument("--seed", type=int, default=0)
+    sliders.add_argument("--repeat", type=int, default=5, help="Timed runs per method, the fastest is shown")
+    sliders.set_defaults(run=bench_sliders)
+
+    cnn = subparsers.add_parser("cnn", help="Keras against the NumPy forward passes, speed and parity")
+    cnn.add_argument("--weights", default="cnn_weights1.h5", help="Keras weight file in weights/")
+    cnn.add_argument("--boards", type=int, default=2000, help="Boards from random games to predict")
+    cnn.add_argument("--dataset", help="Take the boards from this dataset file instead")
+    cnn.add_argument("--batch-size", type=int, default=256)
+    cnn.add_argument("--seconds", type=float, default=1.0, help="Time spent on each measure")
+    cnn.set_defaults(run=bench_cnn)
+
+    args = parser.parse_args()
+    args.run(args)
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,720 @@
+"""
+Bitboard representation of the chess board
+Every piece type of each player is kept as a 64-bit integer whose set bits
+mark the squares that piece stands on. A square is numbered row * 8 + col,
+so bit 0 is board[0][0] and bit 63 is board[7][7].
+
+White pieces are lowercase and start on rows 6 and 7, black pieces are
+uppercase and start on rows 0 and 1, exactly like the list-of-lists board
+used by the game scripts.
+"""
+import random
+from collections import namedtuple
+
+PIECES = "pnbrqkPNBRQK"
+
+FULL = (1 << 64) - 1
+
+SQUARES = [(sq // 8, sq % 8) for sq in range(64)] # Square index to (row, col)
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1"
+
+
+def _leaper_attacks(changes):
+    """Builds the attack table of a piece that jumps to fixed offsets
+    Takes a list of tuple of integers changes and returns a list of 64 bitboards
+    """
+    table = []
+    for row, col in SQUARES:
+        attacks = 0
+        for i, j in changes:
+            if 0 <= row + i <= 7 and 0 <= col + j <= 7:
+                attacks |= 1 << ((row + i) * 8 + col + j)
+        table.append(attacks)
+    return table
+
+KNIGHT_ATTACKS = _leaper_attacks([(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)])
+KING_ATTACKS = _leaper_attacks([(i, j) for i in (-1, 0, 1) for j in (-1, 0, 1) if i or j])
+PAWN_ATTACKS = { # White pawns attack towards row 0, black pawns towards row 7
+    True: _leaper_attacks([(-1, -1), (-1, 1)]),
+    False: _leaper_attacks([(1, -1), (1, 1)]),
+}
+
+ROOK_DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+BISHOP_DIRECTIONS = [(-1, 1), (-1, -1), (1, -1), (1, 1)]
+
+
+def _between_squares():
+    """Builds the table of squares lying strictly between two squares on a shared line
+    Takes nothing and returns a 64 by 64 list of bitboards (0 when not aligned)
+    """
+    table = [[0] * 64 for _ in range(64)]
+    for sq, (row, col) in enumerate(SQUARES):
+        for dx, dy in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+            between = 0
+            temp_row, temp_col = row + dx, col + dy
+            while 0 <= temp_row <= 7 and 0 <= temp_col <= 7:
+                table[sq][temp_row * 8 + temp_col] = between
+                between |= 1 << (temp_row * 8 + temp_col)
+                temp_row += dx
+                temp_col += dy
+    return table
+
+BETWEEN = _between_squares()
+
+
+def _zobrist_keys(seed):
+    """Draws the random 64-bit keys of Zobrist hashing from a fixed seed
+    There is one key per piece per square and one for black to move. The
+    game has no castling and no en passant, so no keys are needed for them.
+    Takes an integer seed and returns a tuple (dict of piece char to a list
+    of 64 keys, integer key)
+    """
+    rng = random.Random(seed)
+    keys = {char: [rng.getrandbits(64) for _ in range(64)] for char in PIECES}
+    return keys, rng.getrandbits(64)
+
+ZOBRIST, ZOBRIST_BLACK_TO_MOVE = _zobrist_keys(20240611) # Same keys in every process
+
+
+# Everything unmake_move needs to take a move back
+Undo = namedtuple("Undo", ["from_sq", "to_sq", "piece", "captured", "promotion"])
+
+
+def squares_of(bb):
+    """Finds and returns the squares of all set bits of a bitboard
+    Takes an integer bb and returns a list of integers, in board-scan order
+    """
+    squares = []
+    while bb:
+        lsb = bb & -bb
+        squares.append(lsb.bit_length() - 1)
+        bb ^= lsb
+    return squares
+
+
+def _rays():
+    """Builds the ray of every square in every sliding direction
+    Takes nothing and returns a dictionary of direction to a list of 64
+    bitboards, the squares from sq (left out) to the edge of the board
+    """
+    rays = {}
+    for dx, dy in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+        table = []
+        for row, col in SQUARES:
+            ray = 0
+            temp_row, temp_col = row + dx, col + dy
+            while 0 <= temp_row <= 7 and 0 <= temp_col <= 7:
+                ray |= 1 << (temp_row * 8 + temp_col)
+                temp_row += dx
+                temp_col += dy
+            table.append(ray)
+        rays[dx, dy] = table
+    return rays
+
+RAYS = _rays()
+
+
+def slider_attacks(sq, directions, occupied):
+    """Finds the squares a sliding piece on sq attacks, up to and including the first blocker
+    Every ray is cut short by taking away the ray that starts at its nearest
+    blocker. On a ray running to higher squares the nearest blocker is the
+    lowest set bit, on the others the highest.
+    Takes an integer sq, a list of tuple of integers directions and an
+    integer occupied and returns a bitboard
+    """
+    attacks = 0
+    for dx, dy in directions:
+        rays = RAYS[dx, dy]
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[(blockers & -blockers).bit_length() - 1 if dx * 8 + dy > 0 else blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+def _relevant_masks(directions):
+    """Builds the squares whose occupancy decides the attacks of a slider on each square
+    The last square of a ray never changes the attacks, a piece there is
+    attacked either way, so it is left out.
+    Takes a list of tuple of integers directions and returns a list of 64 bitboards
+    """
+    masks = []
+    for sq in range(64):
+        mask = 0
+        for dx, dy in directions:
+            ray = RAYS[dx, dy][sq]
+            if ray:
+                mask |= ray ^ (1 << (ray.bit_length() - 1)) if dx * 8 + dy > 0 else ray & (ray - 1)
+        masks.append(mask)
+    return masks
+
+ROOK_MASKS = _relevant_masks(ROOK_DIRECTIONS)
+BISHOP_MASKS = _relevant_masks(BISHOP_DIRECTIONS)
+
+# Attacks of a slider on each square keyed by the occupancy of its relevant
+# squares, the lookup magic bitboards make with a multiply and a shift. An
+# entry is filled the first time its occupancy is met; a full table would
+# hold 102,400 rook and 5,248 bishop entries.
+ROOK_TABLE = [{} for _ in range(64)]
+BISHOP_TABLE = [{} for _ in range(64)]
+
+
+def rook_attacks(sq, occupied):
+    """Finds the squares a rook on sq attacks, up to and including the first blocker
+    Takes an integer sq and a bitboard occupied and returns a bitboard
+    """
+    key = occupied & ROOK_MASKS[sq]
+    attacks = ROOK_TABLE[sq].get(key)
+    if attacks is None:
+        attacks = ROOK_TABLE[sq][key] = slider_attacks(sq, ROOK_DIRECTIONS, key)
+    return attacks
+
+
+def bishop_attacks(sq, occupied):
+    """Finds the squares a bishop on sq attacks, up to and including the first blocker
+    Takes an integer sq and a bitboard occupied and returns a bitboard
+    """
+    key = occupied & BISHOP_MASKS[sq]
+    attacks = BISHOP_TABLE[sq].get(key)
+    if attacks is None:
+        attacks = BISHOP_TABLE[sq][key] = slider_attacks(sq, BISHOP_DIRECTIONS, key)
+    return attacks
+
+
+def queen_attacks(sq, occupied):
+    """Finds the squares a queen on sq attacks, up to and including the first blocker
+    Takes an integer sq and a bitboard occupied and returns a bitboard
+    """
+    return rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+
+
+class Position:
+    """A chess position kept both as bitboards and as the list-of-lists board
+    The list-of-lists board is updated in place, so scripts that print or
+    read the board directly keep working.
+    """
+
+    def __init__(self, board, is_white_turn=True):
+        self.board = board
+        self.is_white_turn = is_white_turn # Flipped by every move made or taken back
+        self.sync()
+
+    def sync(self):
+        """Rebuilds every bitboard from the list-of-lists board and clears the move history
+        Takes nothing and returns None
+        """
+        self.history = [] # Stack of Undo records, one per move made
+        self.pieces = {char: 0 for char in PIECES}
+        for sq, (row, col) in enumerate(SQUARES):
+            char = self.board[row][col]
+            if char != ".":
+                self.pieces[char] |= 1 << sq
+        # The board as 64 ASCII bytes, for encoders that work on whole arrays
+        self.codes = bytearray("".join("".join(row) for row in self.board), "ascii")
+        self.occupancy = {
+            True: self.pieces["p"] | self.pieces["n"] | self.pieces["b"] | self.pieces["r"] | self.pieces["q"] | self.pieces["k"],
+            False: self.pieces["P"] | self.pieces["N"] | self.pieces["B"] | self.pieces["R"] | self.pieces["Q"] | self.pieces["K"],
+        }
+        self.king_square = { # None once a king has been captured
+            True: self.pieces["k"].bit_length() - 1 if self.pieces["k"] else None,
+            False: self.pieces["K"].bit_length() - 1 if self.pieces["K"] else None,
+        }
+        self.key = self.compute_key() # Zobrist key, kept up to date by push and unmake_move
+        return None
+
+    def compute_key(self):
+        """Computes the Zobrist key of the position from scratch
+        push and unmake_move update the key in a few XORs instead, this is
+        for building it once and for checking them.
+        Takes nothing and returns a 64-bit integer
+        """
+        key = 0 if self.is_white_turn else ZOBRIST_BLACK_TO_MOVE
+        for char in PIECES:
+            for sq in squares_of(self.pieces[char]):
+                key ^= ZOBRIST[char][sq]
+        return key
+
+    @property
+    def occupied(self):
+        return self.occupancy[True] | self.occupancy[False]
+
+    def piece_squares(self, is_white):
+        """Finds and returns the squares of all pieces of a player
+        Only the occupied squares are visited, so the cost grows with the
+        number of pieces left instead of the 64 squares of the board.
+        Takes a boolean is_white and returns a list of integers, in board-scan order
+        """
+        return squares_of(self.occupancy[is_white])
+
+    def side_of(self, sq):
+        """Returns True if a white piece stands on square sq, False if a black one does
+        Takes an integer sq and returns a boolean
+        """
+        return bool(self.occupancy[True] >> sq & 1)
+
+    def _slide(self, sq, attacks):
+        """Finds the squares a sliding piece on sq can reach given the squares it attacks
+        Takes an integer sq and a bitboard attacks and returns a list of tuple of integers
+        """
+        targets = attacks & ~self.occupancy[self.side_of(sq)]
+        return [SQUARES[target] for target in squares_of(targets)]
+
+    def _pawn_targets(self, is_white, sq, empty, enemy):
+        """Finds the squares a pawn of player is_white on sq can move to
+        Takes a boolean is_white, an integer sq and two bitboards and returns a bitboard
+        """
+        if is_white:
+            push = (1 << sq) >> 8 & empty
+            double = push >> 8 & empty if sq >> 3 == 6 else 0
+        else:
+            push = (1 << sq) << 8 & empty
+            double = push << 8 & empty if sq >> 3 == 1 else 0
+        return push | double | PAWN_ATTACKS[is_white][sq] & enemy
+
+    def pawn_moves(self, is_white_turn, curr_pos):
+        """Finds and returns all possible moves a pawn can make
+        Takes a boolean is_white_turn and a tuple of integers curr_pos and
+        returns a list of tuple of integers possible moves
+        """
+        targets = self._pawn_targets(is_white_turn, curr_pos[0] * 8 + curr_pos[1],
+                                     ~self.occupied & FULL, self.occupancy[not is_white_turn])
+        return [SQUARES[target] for target in squares_of(targets)]
+
+    def rook_moves(self, curr_pos):
+        """Finds and returns all possible moves a rook can make
+        Takes a tuple of integers curr_pos and returns a list of tuple of integers
+        """
+        sq = curr_pos[0] * 8 + curr_pos[1]
+        return self._slide(sq, rook_attacks(sq, self.occupied))
+
+    def bishop_moves(self, curr_pos):
+        """Finds and returns all possible moves a bishop can make
+        Takes a tuple of integers curr_pos and returns a list of tuple of integers
+        """
+        sq = curr_pos[0] * 8 + curr_pos[1]
+        return self._slide(sq, bishop_attacks(sq, self.occupied))
+
+    def queen_moves(self, curr_pos):
+        """Finds and returns all possible moves a queen can make
+        Takes a tuple of integers curr_pos and returns a list of tuple of integers
+        """
+        sq = curr_pos[0] * 8 + curr_pos[1]
+        return self._slide(sq, queen_attacks(sq, self.occupied))
+
+    def knight_moves(self, curr_pos):
+        """Finds and returns all possible moves a knight can make
+        Takes a tuple of integers curr_pos and returns a list of tuple of integers
+        """
+        sq = curr_pos[0] * 8 + curr_pos[1]
+        targets = KNIGHT_ATTACKS[sq] & ~self.occupancy[self.side_of(sq)]
+        return [SQUARES[target] for target in squares_of(targets)]
+
+    def get_all_moves(self, is_white_turn):
+        """Gets and returns the possible moves of all pieces (except king) of a player
+        Takes a boolean is_white_turn and returns a list of list of tuple of integers
+        """
+        all_moves = []
+        for sq in squares_of(self.occupancy[is_white_turn] & ~self.pieces["k" if is_white_turn else "K"]):
+            pos = SQUARES[sq]
+            char = self.board[pos[0]][pos[1]].lower()
+            if char == "p":
+                all_moves += [[pos, new_pos] for new_pos in self.pawn_moves(is_white_turn, pos)]
+            elif char == "r":
+                all_moves += [[pos, new_pos] for new_pos in self.rook_moves(pos)]
+            elif char == "n":
+                all_moves += [[pos, new_pos] for new_pos in self.knight_moves(pos)]
+            elif char == "b":
+                all_moves += [[pos, new_pos] for new_pos in self.bishop_moves(pos)]
+            elif char == "q":
+                all_moves += [[pos, new_pos] for new_pos in self.queen_moves(pos)]
+        return all_moves
+
+    def is_square_attacked(self, sq, by_white):
+        """Returns True if any piece of the player by_white attacks square sq
+        Looks outward from sq along the knight, king, pawn and ray patterns
+        instead of generating the moves of every enemy piece.
+        Takes an integer sq and a boolean by_white
+        """
+        pawn, knight, bishop, rook, queen, king = "pnbrqk" if by_white else "PNBRQK"
+        pieces = self.pieces
+        if PAWN_ATTACKS[not by_white][sq] & pieces[pawn]:
+            return True
+        if KNIGHT_ATTACKS[sq] & pieces[knight] or KING_ATTACKS[sq] & pieces[king]:
+            return True
+        occupied = self.occupied
+        if bishop_attacks(sq, occupied) & (pieces[bishop] | pieces[queen]):
+            return True
+        return bool(rook_attacks(sq, occupied) & (pieces[rook] | pieces[queen]))
+
+    def attackers_to(self, sq, occupied):
+        """Finds the pieces of both players that attack square sq when the board holds occupied
+        Pieces missing from occupied are left out, and sliders behind them
+        are found, which is what exchanges on one square need.
+        Takes an integer sq and a bitboard occupied and returns a bitboard
+        """
+        pieces = self.pieces
+        return (PAWN_ATTACKS[False][sq] & pieces["p"] | PAWN_ATTACKS[True][sq] & pieces["P"]
+                | KNIGHT_ATTACKS[sq] & (pieces["n"] | pieces["N"])
+                | KING_ATTACKS[sq] & (pieces["k"] | pieces["K"])
+                | bishop_attacks(sq, occupied) & (pieces["b"] | pieces["B"] | pieces["q"] | pieces["Q"])
+                | rook_attacks(sq, occupied) & (pieces["r"] | pieces["R"] | pieces["q"] | pieces["Q"])
+                ) & occupied
+
+    def _attacks_of(self, is_white, occupied):
+        """Finds every square the pieces of a player attack when the board holds occupied
+        Takes a boolean is_white and a bitboard occupied and returns a bitboard
+        """
+        pawn, knight, bishop, rook, queen, king = "pnbrqk" if is_white else "PNBRQK"
+        pieces = self.pieces
+        attacks = 0
+        for sq in squares_of(pieces[pawn]):
+            attacks |= PAWN_ATTACKS[is_white][sq]
+        for sq in squares_of(pieces[knight]):
+            attacks |= KNIGHT_ATTACKS[sq]
+        for sq in squares_of(pieces[king]):
+            attacks |= KING_ATTACKS[sq]
+        for sq in squares_of(pieces[bishop] | pieces[queen]):
+            attacks |= bishop_attacks(sq, occupied)
+        for sq in squares_of(pieces[rook] | pieces[queen]):
+            attacks |= rook_attacks(sq, occupied)
+        return attacks
+
+    def attack_map(self, is_white):
+        """Finds and returns every square attacked by the pieces of a player
+        Takes a boolean is_white and returns a bitboard
+        """
+        return self._attacks_of(is_white, self.occupied)
+
+    def is_king_in_check(self, is_white_turn, curr_pos):
+        """Returns True if the king of the current player standing on curr_pos is in check
+        Takes a boolean is_white_turn and a tuple of integers curr_pos
+        """
+        return self.is_square_attacked(curr_pos[0] * 8 + curr_pos[1], not is_white_turn)
+
+    def in_check(self):
+        """Returns True if the king of the player to move is in check
+        Takes nothing
+        """
+        king_sq = self.king_square[self.is_white_turn]
+        return king_sq is not None and self.is_square_attacked(king_sq, not self.is_white_turn)
+
+    def king_moves(self, is_white_turn, curr_pos):
+        """Finds and returns all moves a king can make without walking into check
+        Takes a boolean is_white_turn and a tuple of integers curr_pos and
+        returns a list of list of tuple of integers
+        """
+        sq = curr_pos[0] * 8 + curr_pos[1]
+        possible_moves = []
+        for target in squares_of(KING_ATTACKS[sq] & ~self.occupancy[is_white_turn]):
+            self.push(sq, target) # Make a temporary move
+            if not self.is_square_attacked(target, not is_white_turn):
+                possible_moves.append([curr_pos, SQUARES[target]])
+            self.unmake_move() # Reverse the temporary move
+        return possible_moves
+
+    def _legal_targets(self):
+        """Yields the legal targets of the pieces of the player to move, one piece at a time
+        Pinned pieces and the squares that answer a check are worked out
+        first, so no move has to be made and tested on the board. The king
+        comes last, so the enemy attack map its moves need is only built when
+        the caller gets that far.
+        Takes nothing and yields tuples (from_sq, targets bitboard)
+        """
+        is_white = self.is_white_turn
+        pawn, knight, bishop, rook, queen, king = "pnbrqk" if is_white else "PNBRQK"
+        pieces = self.pieces
+        own, enemy = self.occupancy[is_white], self.occupancy[not is_white]
+        occupied = own | enemy
+        king_sq = self.king_square[is_white]
+        if king_sq is None: # King already captured
+            return
+
+        enemy_pawn, enemy_knight, enemy_bishop, enemy_rook, enemy_queen = "PNBRQ" if is_white else "pnbrq"
+        diagonal = pieces[enemy_bishop] | pieces[enemy_queen]
+        straight = pieces[enemy_rook] | pieces[enemy_queen]
+        checkers = (PAWN_ATTACKS[is_white][king_sq] & pieces[enemy_pawn]
+                    | KNIGHT_ATTACKS[king_sq] & pieces[enemy_knight]
+                    | bishop_attacks(king_sq, occupied) & diagonal
+                    | rook_attacks(king_sq, occupied) & straight)
+        if checkers & (checkers - 1): # Double check, only the king can move
+            yield king_sq, self._king_targets(king_sq, occupied)
+            return
+
+        check_mask = FULL # Squares a non-king move must land on
+        if checkers: # Capture the checking piece or block its ray
+            check_mask = checkers | BETWEEN[king_sq][checkers.bit_length() - 1]
+
+        # A piece standing alone between the king and an enemy slider may only
+        # move along the line joining them
+        pin_masks = {}
+        pinners = (bishop_attacks(king_sq, enemy) & diagonal
+                   | rook_attacks(king_sq, enemy) & straight)
+        for pinner in squares_of(pinners):
+            blockers = BETWEEN[king_sq][pinner] & occupied
+            if blockers & own and not blockers & (blockers - 1):
+                pin_masks[blockers.bit_length() - 1] = BETWEEN[king_sq][pinner] | (1 << pinner)
+
+        empty = ~occupied & FULL
+        for sq in squares_of(own ^ pieces[king]):
+            bit = 1 << sq
+            if pieces[pawn] & bit:
+                targets = self._pawn_targets(is_white, sq, empty, enemy)
+            elif pieces[knight] & bit:
+                targets = KNIGHT_ATTACKS[sq]
+            elif pieces[bishop] & bit:
+                targets = bishop_attacks(sq, occupied)
+            elif pieces[rook] & bit:
+                targets = rook_attacks(sq, occupied)
+            else:
+                targets = queen_attacks(sq, occupied)
+            targets &= check_mask & ~own
+            if sq in pin_masks:
+                targets &= pin_masks[sq]
+            if targets:
+                yield sq, targets
+        king_targets = self._king_targets(king_sq, occupied)
+        if king_targets:
+            yield king_sq, king_targets
+
+    def _king_targets(self, king_sq, occupied):
+        """Finds the squares the king of the player to move can step to without walking into check
+        Takes an integer king_sq and a bitboard occupied and returns a bitboard
+        """
+        is_white = self.is_white_turn
+        # The king is lifted off the board first so that it cannot hide
+        # behind itself on a checking ray
+        danger = self._attacks_of(not is_white, occupied ^ (1 << king_sq))
+        return KING_ATTACKS[king_sq] & ~self.occupancy[is_white] & ~danger
+
+    def generate_legal(self):
+        """Finds and returns every legal move of the player to move in one pass
+        Takes nothing and returns a list of tuples (from_sq, to_sq)
+        """
+        return [(sq, target) for sq, targets in self._legal_targets() for target in squares_of(targets)]
+
+    def iter_moves(self):
+        """Yields the legal moves of the player to move as packed 16-bit integers
+        The moves of each piece are only generated once the caller has used
+        up those of the piece before, so a caller that stops early skips the
+        rest of the work. Every promotion piece is a move of its own, queen first.
+        Takes nothing and yields integers (see pack_move)
+        """
+        last_row = 0 if self.is_white_turn else 7
+        promoting = self.pieces["p" if self.is_white_turn else "P"]
+        first_code = 1 if self.is_white_turn else 5 # Index of the queen in PROMOTION_CODES
+        for sq, targets in self._legal_targets():
+            move = sq << 6
+            while targets:
+                lsb = targets & -targets
+                to_sq = lsb.bit_length() - 1
+                targets ^= lsb
+                if to_sq >> 3 == last_row and promoting >> sq & 1:
+                    for code in range(first_code, first_code + 4):
+                        yield code << 12 | move | to_sq
+                else:
+                    yield move | to_sq
+
+    def has_legal_move(self):
+        """Returns True if the player to move has any legal move
+        Stops at the first move found instead of generating them all.
+        Takes nothing
+        """
+        return next(self.iter_moves(), None) is not None
+
+    def is_legal(self, move):
+        """Returns True if a packed move is a legal move of the player to move
+        Checks one move, such as one read back from a transposition table,
+        without generating the others: the piece on from_sq must belong to
+        the player to move and reach to_sq, a promotion must name one of its
+        pieces, and the move must not leave its king in check.
+        Takes an integer move (see pack_move)
+        """
+        from_sq, to_sq, promotion = unpack_move(move)
+        is_white = self.is_white_turn
+        own, enemy = self.occupancy[is_white], self.occupancy[not is_white]
+        if not own >> from_sq & 1 or own >> to_sq & 1 or self.king_square[is_white] is None:
+            return False
+        if promotion not in self.promotions(from_sq, to_sq):
+            return False
+
+        occupied = own | enemy
+        char = self.board[from_sq >> 3][from_sq & 7].lower()
+        if char == "p":
+            targets = self._pawn_targets(is_white, from_sq, ~occupied & FULL, enemy)
+        elif char == "n":
+            targets = KNIGHT_ATTACKS[from_sq]
+        elif char == "b":
+            targets = bishop_attacks(from_sq, occupied)
+        elif char == "r":
+            targets = rook_attacks(from_sq, occupied)
+        elif char == "q":
+            targets = queen_attacks(from_sq, occupied)
+        else:
+            targets = KING_ATTACKS[from_sq]
+        if not targets >> to_sq & 1:
+            return False
+
+        self.push(from_sq, to_sq, promotion)
+        legal = not self.is_square_attacked(self.king_square[is_white], not is_white)
+        self.unmake_move()
+        return legal
+
+    def promotions(self, from_sq, to_sq):
+        """Finds the pieces a move may promote to
+        Takes two integers and returns a list of strings, or [None] for a move
+        that is not a promotion
+        """
+        char = self.board[from_sq >> 3][from_sq & 7]
+        if char == "p" and to_sq >> 3 == 0:
+            return ["q", "r", "b", "n"]
+        if char == "P" and to_sq >> 3 == 7:
+            return ["Q", "R", "B", "N"]
+        return [None]
+
+    def make_move(self, curr_pos, next_pos, promotion=None):
+        """Moves the piece on curr_pos to next_pos
+        Takes two tuples of integers and an optional string promotion and
+        returns the Undo record of the move
+        """
+        return self.push(curr_pos[0] * 8 + curr_pos[1], next_pos[0] * 8 + next_pos[1], promotion)
+
+    def push(self, from_sq, to_sq, promotion=None):
+        """Moves the piece on from_sq to to_sq on the board and the bitboards
+        A pawn reaching the last row is promoted to promotion, or to a random
+        piece when promotion is None. The Undo record is also kept on the
+        history stack for unmake_move.
+        Takes two integers and an optional string promotion and returns an Undo
+        """
+        row0, col0 = SQUARES[from_sq]
+        row1, col1 = SQUARES[to_sq]
+        char = self.board[row0][col0]
+        captured = self.board[row1][col1]
+        is_white = char.islower()
+
+        if captured != ".":
+            self.pieces[captured] ^= 1 << to_sq
+            self.occupancy[not is_white] ^= 1 << to_sq
+            self.key ^= ZOBRIST[captured][to_sq]
+            if captured == "k" or captured == "K":
+                self.king_square[not is_white] = None
+
+        new_char = char
+        if char == "p" and row1 == 0: # White-pawn promotion
+            new_char = promotion or random.choice(["n", "q", "b", "r"])
+        elif char == "P" and row1 == 7: # Black-pawn promotion
+            new_char = promotion or random.choice(["N", "Q", "B", "R"])
+
+        self.pieces[char] ^= 1 << from_sq
+        self.pieces[new_char] ^= 1 << to_sq
+        self.occupancy[is_white] ^= (1 << from_sq) | (1 << to_sq)
+        self.key ^= ZOBRIST[char][from_sq] ^ ZOBRIST[new_char][to_sq] ^ ZOBRIST_BLACK_TO_MOVE
+        if char == "k" or char == "K":
+            self.king_square[is_white] = to_sq
+
+        self.board[row1][col1] = new_char
+        self.board[row0][col0] = "."
+        self.codes[to_sq] = ord(new_char)
+        self.codes[from_sq] = 46 # "."
+
+        undo = Undo(from_sq, to_sq, char, captured, new_char if new_char != char else None)
+        self.is_white_turn = not self.is_white_turn
+        self.history.append(undo)
+        return undo
+
+    def unmake_move(self):
+        """Takes back the last move made with make_move or push
+        Only the two squares touched by the move are rewritten.
+        Takes nothing and returns the Undo record of the move taken back
+        """
+        undo = self.history.pop()
+        from_sq, to_sq, char, captured = undo.from_sq, undo.to_sq, undo.piece, undo.captured
+        row0, col0 = SQUARES[from_sq]
+        row1, col1 = SQUARES[to_sq]
+        is_white = char.islower()
+
+        self.pieces[undo.promotion or char] ^= 1 << to_sq
+        self.pieces[char] ^= 1 << from_sq
+        self.occupancy[is_white] ^= (1 << from_sq) | (1 << to_sq)
+        self.key ^= ZOBRIST[char][from_sq] ^ ZOBRIST[undo.promotion or char][to_sq] ^ ZOBRIST_BLACK_TO_MOVE
+        if char == "k" or char == "K":
+            self.king_square[is_white] = from_sq
+
+        if captured != ".":
+            self.pieces[captured] ^= 1 << to_sq
+            self.occupancy[not is_white] ^= 1 << to_sq
+            self.key ^= ZOBRIST[captured][to_sq]
+            if captured == "k" or captured == "K":
+                self.king_square[not is_white] = to_sq
+
+        self.board[row0][col0] = char
+        self.board[row1][col1] = captured
+        self.codes[from_sq] = ord(char)
+        self.codes[to_sq] = ord(captured)
+        self.is_white_turn = not self.is_white_turn
+        return undo
+
+
+def legal_moves(position):
+    """Finds and returns every legal move of the player to move
+    Takes a Position and returns a list of list of tuple of integers
+    """
+    return [[SQUARES[from_sq], SQUARES[to_sq]] for from_sq, to_sq in position.generate_legal()]
+
+
+def legal_move_set(position):
+    """Finds the legal moves of the player to move as a set, for validating moves
+    Moves are integers from_sq << 6 | to_sq, so a membership test is one
+    hash lookup. A promotion is one move, the piece is chosen when it is made.
+    Takes a Position and returns a frozenset of integers
+    """
+    return frozenset([from_sq << 6 | to_sq for from_sq, to_sq in position.generate_legal()])
+
+
+def from_fen(fen):
+    """Builds a Position from the piece placement and side-to-move fields of a FEN string
+    FEN writes white in uppercase while this board writes white in lowercase,
+    so the case of every piece is swapped. Castling and en-passant fields are
+    ignored because neither move exists in this game.
+    Takes a string fen and returns a Position
+    """
+    fields = fen.split()
+    board = []
+    for rank in fields[0].split("/"):
+        row = []
+        for char in rank:
+            row += ["."] * int(char) if char.isdigit() else [char.swapcase()]
+        board.append(row)
+    return Position(board, len(fields) < 2 or fields[1] == "w")
+
+
+def square_name(sq):
+    """Turns a square index into its algebraic name, eg. 52 -> 'e2'
+    Takes an integer sq and returns a string
+    """
+    return "abcdefgh"[sq & 7] + str(8 - (sq >> 3))
+
+
+PROMOTION_CODES = ".qrbnQRBN" # Index 0 means no promotion
+
+
+def pack_move(from_sq, to_sq, promotion=None):
+    """Packs a move into 16 bits: promotion << 12 | from_sq << 6 | to_sq
+    Takes two integers and an optional string promotion and returns an integer
+    """
+    return (PROMOTION_CODES.index(promotion) << 12 if promotion else 0) | from_sq << 6 | to_sq
+
+
+def unpack_move(move):
+    """Unpacks a move made by pack_move
+    Takes an integer and returns a tuple (from_sq, to_sq, promotion or None)
+    """
+    return move >> 6 & 63, move & 63, PROMOTION_CODES[move >> 12] if move >> 12 else None
+
+
+def move_name(from_sq, to_sq, promotion=None):
+    """Turns a move into coordinate notation, eg. 'e2e4' or 'a7a8q'
+    Takes two integers and an optional string promotion and returns a string
+    """
+    return square_name(from_sq) + square_name(to_sq) + (promotion.lower() if promotion else "")
@@ -0,0 +1,134 @@
+"""
+Sharded training data collection
+Plays collecting_training_data games across a pool of worker processes.
+Every worker fills its own shard file in the output directory from its own
+random seed, so no two processes write to the same file, and the seed,
+games and sample count of every finished shard go into the directory's
+manifest.json (see dataset.py). dataset.ShardedDataset reads the shards as
+one dataset; python dataset.py merge joins them into one file.
+
+Running again on the same directory adds new shards numbered after every
+shard already recorded or on disk, with seeds after the highest recorded
+one, so a run that was stopped can be carried on without repeating a
+shard. A shard file the manifest does not list, left by a stopped run,
+is ignored.
+
+Usage:
+    python collect.py training_data/shards --shards 8 --games 100
+    python collect.py training_data/shards --shards 32 --workers 8 --samples 1000000
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import random
+import time
+from bitboard import START_FEN, from_fen
+from dataset import SampleWriter, ShardedDataset, read_manifest, write_manifest
+from game_output import QUIET
+import collecting_training_data
+
+
+def shard_name(index):
+    """Names the file of a shard
+    Takes an integer index and returns a string
+    """
+    return f"shard-{index:05d}.bin"
+
+
+def shard_index(name):
+    """Reads the index out of the name of a shard file
+    Takes a string file name or path and returns an integer
+    """
+    return int(os.path.basename(name)[len("shard-"):-len(".bin")])
+
+
+def collect_shard(directory, index, seed, games=None, samples=None):
+    """Fills one new shard with the samples of seeded random games
+    Games are played until either limit is reached, a game is never cut
+    short. An existing shard file is never written to.
+    Takes a string directory, an integer shard index, an integer seed and
+    an optional integer number of games and of samples and returns the
+    manifest entry of the shard, a dict
+    """
+    random.seed(seed)
+    path = os.path.join(directory, shard_name(index))
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists")
+    played = 0
+    start = time.perf_counter()
+    with SampleWriter(path) as writer:
+        while (games is None or played < games) and (samples is None or len(writer) < samples):
+            collecting_training_data.game(QUIET, None, writer, from_fen(START_FEN))
+            played += 1
+    return {"path": shard_name(index), "seed": seed, "games": played, "samples": len(writer),
+            "seconds": round(time.perf_counter() - start, 3)}
+
+
+def _collect_shard(task):
+    """Unpacks a task for Pool.imap_unordered
+    Takes a tuple of the arguments of collect_shard and returns its result
+    """
+    return collect_shard(*task)
+
+
+def run(directory, shards, workers=None, seed=0, games=None, samples=None):
+    """Collects new shards into a directory across a process pool
+    New shards are numbered after the highest shard index recorded in the
+    manifest or found on disk. Their seeds count up from seed, or from
+    after the highest recorded seed when that is higher. The manifest is
+    written again as each shard finishes, so stopping a long run keeps the
+    shards it completed.
+    Takes a string directory, the integer number of shards, an optional
+    integer number of worker processes (defaults to the number of cores),
+    an integer base seed and the optional integer games and samples of each
+    shard and returns a tuple (list of new manifest entries, seconds taken)
+    """
+    if games is None and samples is None:
+        raise ValueError("a shard needs a number of games or of samples to stop at")
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory)
+    used = [shard_index(shard["path"]) for shard in manifest["shards"]]
+    used += [shard_index(path) for path in glob.glob(os.path.join(directory, "shard-*.bin"))]
+    first = max(used, default=-1) + 1
+    seed = max([seed] + [shard["seed"] + 1 for shard in manifest["shards"]])
+    tasks = [(directory, first + i, seed + i, games, samples) for i in range(shards)]
+    workers = min(workers or multiprocessing.cpu_count(), shards)
+
+    entries = []
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        for entry in pool.imap_unordered(_collect_shard, tasks):
+            entries.append(entry)
+            manifest["shards"].append(entry)
+            manifest["shards"].sort(key=lambda shard: shard["path"])
+            write_manifest(directory, manifest)
+    seconds = time.perf_counter() - start
+    entries.sort(key=lambda shard: shard["path"])
+    return entries, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect training data in parallel, one shard file per worker")
+    parser.add_argument("directory", help="Directory of the shards and their manifest")
+    parser.add_argument("--shards", type=int, default=multiprocessing.cpu_count(), help="Shards to add (default: number of cores)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: number of cores)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first new shard, later shards count up")
+    parser.add_argument("--games", type=int, default=None, help="Games per shard")
+    parser.add_argument("--samples", type=int, default=None, help="Samples per shard, rounded up to a whole game")
+    args = parser.parse_args()
+    if args.games is None and args.samples is None:
+        args.games = 10
+
+    entries, seconds = run(args.directory, args.shards, args.workers, args.seed, args.games, args.samples)
+    samples = sum(entry["samples"] for entry in entries)
+    games = sum(entry["games"] for entry in entries)
+    print(f"Shards: {len(entries)}  Games: {games}  Samples: {samples:,}")
+    print(f"Time: {seconds:.2f}s ({samples / seconds:,.0f} samples/s, {games / seconds:.1f} games/s)")
+    print(f"{args.directory} now holds {len(ShardedDataset(args.directory)):,} samples in "
+          f"{len(read_manifest(args.directory)['shards'])} shards")
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Training data storage
+Samples are stored in a fixed-record binary file: a 16-byte header (the
+magic b"CHDS", a uint32 format version and a uint64 sample count)
+followed by one 68-byte record per sample, an int8 8x8 board and a uint8
+4-coordinate label. load() memory-maps the records, so opening a dataset
+is instant and reads no more than the samples touched.
+
+A data point is the 8x8 board as seen by the player to move (see
+collecting_training_data.py) and a label is the 4 coordinates of a move.
+
+A sharded dataset is a directory of dataset files written in parallel
+(see collect.py) and a manifest.json listing them. ShardedDataset reads
+the shards as one dataset without copying them.
+
+Converting the old pickle files:
+    python dataset.py convert training_data/X.pkl training_data/Y.pkl training_data/dataset.bin
+Joining the shards of a directory into one file:
+    python dataset.py merge training_data/shards training_data/dataset.bin
+"""
+import argparse
+import json
+import os
+import pickle
+import struct
+import numpy as np
+
+MAGIC = b"CHDS"
+VERSION = 1
+HEADER = struct.Struct("<4sIQ") # Magic, version, sample count
+RECORD = np.dtype([("board", np.int8, (8, 8)), ("label", np.uint8, (4,))])
+
+CHUNK_SIZE = 65536 # Samples held in memory before a flush
+
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def read_header(f):
+    """Reads and checks the header of a dataset file
+    Takes a binary file object positioned at the start and returns the sample count
+    """
+    magic, version, count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{f.name} is not a dataset file")
+    if version != VERSION:
+        raise ValueError(f"{f.name} has format version {version}, expected {VERSION}")
+    return count
+
+
+class SampleWriter:
+    """Buffers samples and appends them to a dataset file in chunks
+    Samples are added to an existing file. Use it as a context manager, or
+    call close(), so the last chunk is written.
+    """
+
+    def __init__(self, path="training_data/dataset.bin", chunk_size=CHUNK_SIZE):
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.file = open(path, "r+b")
+            self.written = read_header(self.file)
+        else:
+            self.file = open(path, "w+b")
+            self.written = 0 # Samples already flushed
+            self.file.write(HEADER.pack(MAGIC, VERSION, 0))
+        self.records = np.empty(chunk_size, dtype=RECORD)
+        self.size = 0 # Samples waiting in the buffer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, data_point, labels):
+        """Adds one sample for every label, all sharing the same board
+        Takes an 8*8 array data_point and a list of labels (each a list of
+        4 integers) or an (n, 4) array of labels (see encoder.label_columns)
+        and returns None
+        """
+        start = 0
+        while start < len(labels):
+            count = min(len(labels) - start, len(self.records) - self.size)
+            self.records["board"][self.size:self.size + count] = data_point
+            self.records["label"][self.size:self.size + count] = labels[start:start + count]
+            self.size += count
+            start += count
+            if self.size == len(self.records):
+                self.flush()
+        return None
+
+    def add_batch(self, boards, labels):
+        """Adds one sample per row of two equally long arrays
+        Takes an (n, 8, 8) array boards and an (n, 4) array labels and returns None
+        """
+        start = 0
+        while start < len(boards):
+            count = min(len(boards) - start, len(self.records) - self.size)
+            self.records["board"][self.size:self.size + count] = boards[start:start + count]
+            self.records["label"][self.size:self.size + count] = labels[start:start + count]
+            self.size += count
+            start += count
+            if self.size == len(self.records):
+                self.flush()
+        return None
+
+    def flush(self):
+        """Appends the buffered records and updates the sample count in the header
+        Takes nothing and returns None
+        """
+        if self.size:
+            self.file.seek(HEADER.size + self.written * RECORD.itemsize)
+            self.file.write(self.records[:self.size].tobytes())
+            self.written += self.size
+            self.size = 0
+            self.file.seek(0)
+            self.file.write(HEADER.pack(MAGIC, VERSION, self.written))
+        self.file.flush()
+        return None
+
+    def close(self):
+        """Flushes the last chunk and closes the file
+        Takes nothing and returns None
+        """
+        self.flush()
+        self.file.close()
+        return None
+
+    def __len__(self):
+        return self.written + self.size
+
+
+def load(path):
+    """Memory-maps a dataset file without copying it
+    Takes a string path and returns a tuple (boards, labels) of read-only
+    numpy arrays shaped (n, 8, 8) int8 and (n, 4) uint8
+    """
+    with open(path, "rb") as f:
+        count = read_header(f)
+    if count == 0:
+        return np.empty((0, 8, 8), dtype=np.int8), np.empty((0, 4), dtype=np.uint8)
+    records = np.memmap(path, dtype=RECORD, mode="r", offset=HEADER.size, shape=(count,))
+    return records["board"], records["label"]
+
+
+def read_manifest(directory):
+    """Reads the manifest of a sharded dataset
+    Takes a string directory and returns a dict with a list of shards, each
+    a dict with at least the keys path (relative to directory) and samples,
+    empty when the directory has no manifest yet
+    """
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return {"version": MANIFEST_VERSION, "samples": 0, "shards": []}
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"{path} has manifest version {manifest.get('version')}, expected {MANIFEST_VERSION}")
+    return manifest
+
+
+def write_manifest(directory, manifest):
+    """Writes the manifest of a sharded dataset, replacing the old one in a single step
+    A reader never sees a half-written manifest, even when the writer is
+    stopped halfway.
+    Takes a string directory and a manifest dict and returns None
+    """
+    manifest["samples"] = sum(shard["samples"] for shard in manifest["shards"])
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + ".tmp", path)
+    return None
+
+
+class ShardedDataset:
+    """The shards of a sharded dataset, read as one dataset
+    Every shard is memory-mapped with load and the sample counts come from
+    the shard headers, so a shard still being written only shows the
+    samples it has flushed. Sample i of the dataset is found with a binary
+    search over the offsets at which the shards start.
+    """
+
+    def __init__(self, directory):
+        manifest = read_manifest(directory)
+        self.paths = [os.path.join(directory, shard["path"]) for shard in manifest["shards"]]
+        self.shards = [load(path) for path in self.paths]
+        self.offsets = np.cumsum([0] + [len(labels) for _, labels in self.shards]) # Start of every shard, then the end
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getitem__(self, index):
+        """Gathers samples from whichever shards hold them
+        A slice that stays inside one shard is served as a read-only view of
+        its memory map, without copying; any other index copies the samples.
+        Takes an integer, a slice or an array of integer indices and returns
+        a tuple (boards, labels) of numpy arrays, one board and one label for
+        an integer index
+        """
+        if isinstance(index, (int, np.integer)):
+            boards, labels = self[np.array([index])]
+            return boards[0], labels[0]
+        if isinstance(index, slice):
+            rows = range(*index.indices(len(self)))
+            if len(rows):
+                first, last = np.searchsorted(self.offsets, [rows[0], rows[-1]], side="right") - 1
+                if first == last:
+                    offset = int(self.offsets[first])
+                    stop = rows.stop - offset
+                    local = slice(rows.start - offset, stop if stop >= 0 else None, rows.step)
+                    shard_boards, shard_labels = self.shards[first]
+                    return shard_boards[local], shard_labels[local]
+            index = np.arange(rows.start, rows.stop, rows.step)
+        index = np.asarray(index, dtype=np.int64)
+        index = np.where(index < 0, index + len(self), index)
+        if len(index) and (index.min() < 0 or index.max() >= len(self)):
+            raise IndexError(f"index out of range for a dataset of {len(self)} samples")
+
+        shard_of = np.searchsorted(self.offsets, index, side="right") - 1
+        boards = np.empty((len(index), 8, 8), dtype=np.int8)
+        labels = np.empty((len(index), 4), dtype=np.uint8)
+        for shard in np.unique(shard_of):
+            rows = shard_of == shard
+            shard_boards, shard_labels = self.shards[shard]
+            local = index[rows] - self.offsets[shard]
+            boards[rows] = shard_boards[local]
+            labels[rows] = shard_labels[local]
+        return boards, labels
+
+    def merge(self, out_path):
+        """Writes every shard, in manifest order, to a new dataset file
+        An existing file is refused rather than appended to, so merging
+        twice cannot hold the samples twice.
+        Takes a string out_path and returns the number of samples the new
+        file holds, read back from its header
+        """
+        if os.path.exists(out_path):
+            raise FileExistsError(f"{out_path} already exists, merge writes a new dataset file")
+        with SampleWriter(out_path) as writer:
+            for boards, labels in self.shards:
+                writer.add_batch(boards, labels)
+        with open(out_path, "rb") as f:
+            return read_header(f)
+
+
+def load_pickled(path):
+    """Loads every frame of an X or Y pickle file into one array
+    Reads both one-sample-per-frame files, as the collector used to
+    write, and files whose frames hold whole arrays of samples.
+    Takes a string path and returns a numpy array with one row per sample
+    """
+    frames = []
+    with open(path, "rb") as f:
+        while True:
+            try:
+                frame = np.asarray(pickle.load(f))
+            except EOFError:
+                break
+            single_sample = frame.shape == (8, 8) or frame.shape == (4,)
+            frames.append(frame[None] if single_sample else frame)
+    if not frames:
+        return np.empty((0,))
+    return np.concatenate(frames)
+
+
+def convert_pickles(x_path, y_path, out_path):
+    """Converts an X/Y pair of pickle files into a new dataset file
+    An existing file is refused rather than appended to, so converting
+    twice cannot hold the samples twice.
+    Takes three string paths and returns the number of samples the new
+    file holds, read back from its header
+    """
+    if os.path.exists(out_path):
+        raise FileExistsError(f"{out_path} already exists, convert writes a new dataset file")
+    boards, labels = load_pickled(x_path), load_pickled(y_path)
+    if len(boards) != len(labels):
+        raise ValueError(f"{x_path} holds {len(boards)} boards but {y_path} holds {len(labels)} labels")
+    with SampleWriter(out_path) as writer:
+        writer.add_batch(boards, labels)
+    with open(out_path, "rb") as f:
+        return read_header(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Training data storage")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert = subparsers.add_parser("convert", help="Convert X/Y pickle files into a dataset file")
+    convert.add_argument("x_path")
+    convert.add_argument("y_path")
+    convert.add_argument("out_path")
+    merge = subparsers.add_parser("merge", help="Join the shards of a sharded dataset into one dataset file")
+    merge.add_argument("directory")
+    merge.add_argument("out_path")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        if os.path.exists(args.out_path):
+            parser.error(f"{args.out_path} already exists, convert writes a new dataset file")
+        count = convert_pickles(args.x_path, args.y_path, args.out_path)
+        print(f"Converted {count} samples into {args.out_path}")
+    else:
+        if os.path.exists(args.out_path):
+            parser.error(f"{args.out_path} already exists, merge writes a new dataset file")
+        count = ShardedDataset(args.directory).merge(args.out_path)
+        print(f"Merged {count} samples into {args.out_path}")
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Vectorized board encoding for training and prediction
+A board is encoded as an 8x8 matrix of numbers seen from the side of the
+player to move: that player's pieces get the small numbers, and for black
+the board is turned around so black plays up the board like white does.
+
+Boards are read from Position.codes, the board as 64 ASCII bytes, and
+translated with a 256-entry lookup table, so a whole batch of boards is
+encoded with one table lookup and one flip.
+
+A label is the move the CNN predicts, the 4 coordinates (from row, from
+column, to row, to column) seen from the same side. Moves and labels are
+also kept as integers below 4096, from_sq << 6 | to_sq with squares
+numbered row * 8 + col (see bitboard.pack_move). The 4 coordinates are then
+the 4 octal digits of the integer, and turning the board around for black
+turns every coordinate x into 7 - x, which is flipping all 12 bits.
+"""
+import numpy as np
+
+TRANSFORMER = {
+    # Transforms board characters to numerical equivalents
+    "p": 1, "P": 15,
+    "r": 2, "R": 16,
+    "n": 3, "N": 17,
+    "b": 4, "B": 18,
+    "q": 5, "Q": 19,
+    "k": 7, "K": 21,
+    ".": 0
+}
+
+WHITE_TABLE = np.zeros(256, dtype=np.int8) # White to move: pieces as they are
+BLACK_TABLE = np.zeros(256, dtype=np.int8) # Black to move: colours swapped
+for char, value in TRANSFORMER.items():
+    WHITE_TABLE[ord(char)] = value
+    BLACK_TABLE[ord(char.swapcase())] = value
+
+
+def encode(codes, is_white_turn):
+    """Encodes one board for the player to move
+    Takes the 64 ASCII bytes of a board (eg. Position.codes) and a boolean
+    is_white_turn and returns an 8*8 int8 numpy array
+    """
+    squares = np.frombuffer(codes, dtype=np.uint8)
+    if is_white_turn:
+        return WHITE_TABLE[squares].reshape(8, 8)
+    return BLACK_TABLE[squares][::-1].reshape(8, 8) # Turned around by 180 degrees
+
+
+def encode_batch(codes_list, white_turns):
+    """Encodes many boards in one call
+    Takes a list of 64-byte boards and a list of booleans, the player to move
+    on each board, and returns an (n, 8, 8) int8 numpy array
+    """
+    squares = np.frombuffer(b"".join(codes_list), dtype=np.uint8).reshape(-1, 64)
+    white_turns = np.asarray(white_turns, dtype=bool)
+    data = WHITE_TABLE[squares]
+    data[~white_turns] = BLACK_TABLE[squares[~white_turns]][:, ::-1]
+    return data.reshape(-1, 8, 8)
+
+
+FLIP = 0o7777 # Turns a label around for black, each coordinate x becomes 7 - x
+LABEL_SHIFTS = np.array([9, 6, 3, 0]) # Bit offset of each coordinate in a label
+LABEL_WEIGHTS = np.array([512, 64, 8, 1])
+
+
+def move_label(move, is_white_turn):
+    """Turns a move into the label of the player who makes it
+    The promotion bits of a packed move are dropped.
+    Takes an integer move (from_sq << 6 | to_sq) and a boolean is_white_turn
+    and returns an integer label
+    """
+    return (move & 0o7777) ^ (0 if is_white_turn else FLIP)
+
+
+def label_move(label, is_white_turn):
+    """Turns a label of the player to move back into a move on the board
+    Takes an integer label and a boolean is_white_turn and returns an integer
+    move (from_sq << 6 | to_sq)
+    """
+    return label ^ (0 if is_white_turn else FLIP)
+
+
+def label_columns(labels):
+    """Splits integer labels into their 4 coordinates, the columns the CNN heads predict
+    Takes a sequence or numpy array of n integer labels and returns an (n, 4)
+    uint8 numpy array
+    """
+    labels = np.asarray(labels, dtype=np.int64).reshape(-1, 1)
+    return (labels >> LABEL_SHIFTS & 7).astype(np.uint8)
+
+
+def label_indices(columns):
+    """Joins label coordinates back into integer labels
+    Takes an (n, 4) or (4,) array of coordinates and returns an (n,) or ()
+    int64 numpy array
+    """
+    return np.asarray(columns, dtype=np.int64) @ LABEL_WEIGHTS
@@ -0,0 +1,45 @@
+"""
+Static exchange evaluation
+Works out what a capture wins once every piece attacking the square has
+joined in, cheapest first, without making any move on the board. Either
+player may stop recapturing as soon as going on would lose material.
+Sliders lined up behind a capturing piece join in once it has moved.
+"""
+
+# Piece values in centipawns, indexed by the ASCII code of the piece char
+EXCHANGE_VALUES = [0] * 128
+for char, value in zip("pnbrqk", [100, 320, 330, 500, 900, 20000]):
+    EXCHANGE_VALUES[ord(char)] = EXCHANGE_VALUES[ord(char.upper())] = value
+
+CHEAPEST_FIRST = {True: "pnbrqk", False: "PNBRQK"} # Piece chars of each player, least valuable first
+
+
+def static_exchange(position, from_sq, to_sq):
+    """Finds the material a capture wins or loses once the exchange it starts is over
+    Takes a Position and two integers and returns an integer in centipawns,
+    negative for a losing capture
+    """
+    pieces = position.pieces
+    gains = [EXCHANGE_VALUES[position.codes[to_sq]]]
+    on_square = EXCHANGE_VALUES[position.codes[from_sq]] # Value of the piece the next capture takes
+    is_white = not position.side_of(from_sq) # The player to recapture
+    occupied = position.occupied ^ (1 << from_sq)
+    attackers = position.attackers_to(to_sq, occupied)
+    while True:
+        for char in CHEAPEST_FIRST[is_white]:
+            bb = pieces[char] & attackers
+            if bb:
+                break
+        else: # Nothing left to recapture with
+            break
+        gains.append(on_square - gains[-1])
+        on_square = EXCHANGE_VALUES[ord(char)]
+        occupied ^= bb & -bb
+        attackers = position.attackers_to(to_sq, occupied)
+        is_white = not is_white
+
+    # Walk back through the exchange, letting each player stop when it pays
+    while len(gains) > 1:
+        last = gains.pop()
+        gains[-1] = -max(-gains[-1], last)
+    return gains[0]
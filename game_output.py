@@ -0,0 +1,67 @@
+"""
+Verbosity-controlled output for the game loops
+QUIET prints nothing, RESULT prints only the final board and the result,
+EVERY_PLY also renders the board and echoes the move on every ply, which is
+what the scripts have always done.
+
+Output goes to any file-like sink: sys.stdout by default, an io.StringIO
+to keep it in memory, or a file opened with a large buffer so that batch
+runs do not pay one write per line.
+"""
+import sys
+
+QUIET, RESULT, EVERY_PLY = 0, 1, 2
+
+
+def render_board(board):
+    """Renders the board the way display_board prints it, as one string
+    Takes a list of list of strings board and returns a string
+    """
+    return "\n".join(str(row) for row in board) + "\n\n\n"
+
+
+def open_log(path, buffer_size=1 << 20):
+    """Opens a file sink with a large write buffer
+    Takes a string path and an integer buffer_size and returns a file object
+    """
+    return open(path, "w", buffering=buffer_size)
+
+
+class GameOutput:
+    """Writes game output at or below a verbosity level to a sink"""
+
+    def __init__(self, verbosity=EVERY_PLY, sink=None):
+        self.verbosity = verbosity
+        self.sink = sys.stdout if sink is None else sink
+
+    def board(self, board):
+        """Renders the board on every ply
+        Takes a list of list of strings board and returns None
+        """
+        if self.verbosity >= EVERY_PLY:
+            self.sink.write(render_board(board))
+        return None
+
+    def ply(self, *args):
+        """Echoes a per-ply message, eg. the move just played
+        Takes any printable arguments and returns None
+        """
+        if self.verbosity >= EVERY_PLY:
+            print(*args, file=self.sink)
+        return None
+
+    def final_board(self, board):
+        """Renders the board at the end of the game
+        Takes a list of list of strings board and returns None
+        """
+        if self.verbosity >= RESULT:
+            self.sink.write(render_board(board))
+        return None
+
+    def result(self, *args):
+        """Prints an end-of-game message, eg. the winner
+        Takes any printable arguments and returns None
+        """
+        if self.verbosity >= RESULT:
+            print(*args, file=self.sink)
+        return None
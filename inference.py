@@ -0,0 +1,109 @@
+"""
+Micro-batching inference server
+Games running in many threads hand their boards to one InferenceServer.
+A worker thread gathers them into batches, bounded by a maximum batch
+size and a maximum wait, joins each batch into one array, runs one forward
+pass per batch and hands every game its own row of the result.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+
+class InferenceServer:
+    """Batches single-board predictions from concurrent callers
+    collate joins a list of n submitted boards into the input of
+    predict_batch, by default stacking n encoded 8*8 arrays. predict_batch
+    returns an array (or a list of arrays, one per model head) whose first
+    axis has length n.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=64, max_wait=0.005, collate=np.stack):
+        self.predict_batch = predict_batch
+        self.collate = collate
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait # Seconds the first board of a batch may wait for company
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.samples = 0
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, data_point):
+        """Queues one board for prediction
+        Takes a board in the form collate expects (an 8*8 numpy array by
+        default) and returns a Future of its result row
+        """
+        future = Future()
+        self.requests.put((data_point, future))
+        return future
+
+    def predict(self, data_point):
+        """Predicts one board, waiting for the batch it joins
+        Takes a board in the form collate expects and returns its result row
+        """
+        return self.submit(data_point).result()
+
+    def _next_batch(self):
+        """Waits for a board, then gathers more until the batch is full or the wait is over
+        Takes nothing and returns a list of (data_point, future), or None once closed
+        """
+        first = self.requests.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                request = self.requests.get(timeout=timeout) if timeout > 0 else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None: # Closing, serve what has been gathered first
+                self.requests.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _serve(self):
+        """Runs batches until the server is closed
+        Takes nothing and returns None
+        """
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return None
+            futures = [future for _, future in batch]
+            try:
+                outputs = self.predict_batch(self.collate([data_point for data_point, _ in batch]))
+            except Exception as error:
+                for future in futures:
+                    future.set_exception(error)
+                continue
+            self.batches += 1
+            self.samples += len(batch)
+            for i, future in enumerate(futures):
+                if isinstance(outputs, (list, tuple)): # One array per model head
+                    future.set_result([head[i] for head in outputs])
+                else:
+                    future.set_result(outputs[i])
+
+    def close(self):
+        """Serves the boards already queued, then stops the worker thread
+        Takes nothing and returns None
+        """
+        self.requests.put(None)
+        self.thread.join()
+        return None
+
+    @property
+    def mean_batch_size(self):
+        return self.samples / self.batches if self.batches else 0.0
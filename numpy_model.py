@@ -0,0 +1,192 @@
+"""
+The CNN as a plain NumPy forward pass
+Exports the Keras weight files in weights/ to .npz files that NumpyModel
+runs without TensorFlow, so CPU-only game workers only need NumPy. The
+architecture is the one built in ai_vs_cnn.load_model: a 3x3 convolution
+to 32 channels, 2x2 max pooling, a 3x3 convolution to 64 channels, a dense
+layer of 64 and four 8-way softmax heads.
+
+An int8 export stores every weight matrix as int8 with one scale per output
+unit. At run time the inputs of each layer are quantized to int8 with one
+scale per row, and the products are summed exactly (see _layer).
+
+Exporting:
+    python numpy_model.py export weights/cnn_weights1.h5
+    python numpy_model.py export weights/cnn_weights1.h5 --int8
+"""
+import argparse
+import os
+from collections import namedtuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+LAYERS = ["conv1", "conv2", "dense", "heads"]
+
+# max_abs_diff is the largest difference between two probabilities, head_agreement
+# the fraction of argmaxes both models agree on and label_agreement the fraction of
+# boards on which all 4 argmaxes agree
+Parity = namedtuple("Parity", ["max_abs_diff", "head_agreement", "label_agreement"])
+
+
+def read_h5(path):
+    """Reads a Keras weight file into the matrices the forward pass uses
+    Every layer becomes an (inputs, outputs) kernel and a bias. The
+    convolution kernels are flattened in (row, column, channel) order, the
+    order of the windows they are multiplied with, and the four heads are
+    joined into one (64, 32) kernel.
+    Takes a string path and returns a dict of float32 numpy arrays
+    """
+    import h5py
+
+    with h5py.File(path, "r") as f:
+        layers = {}
+        for name in f.attrs["layer_names"]:
+            name = name.decode() if isinstance(name, bytes) else name
+            weight_names = f[name].attrs.get("weight_names", [])
+            if len(weight_names):
+                layers[name] = [np.asarray(f[name][w], dtype=np.float32) for w in weight_names]
+    convs = [layers[name] for name in layers if name.startswith("conv2d")]
+    dense = [layers[name] for name in layers if name.startswith("dense")]
+    heads = [layers[f"output{i}"] for i in range(1, 5)]
+    if len(convs) != 2 or len(dense) != 1:
+        raise ValueError(f"{path} does not hold the weights of the ai_vs_cnn model")
+
+    weights = {}
+    for name, (kernel, bias) in zip(["conv1", "conv2", "dense"], convs + dense):
+        weights[f"{name}_kernel"] = kernel.reshape(-1, kernel.shape[-1])
+        weights[f"{name}_bias"] = bias
+    weights["heads_kernel"] = np.concatenate([kernel for kernel, _ in heads], axis=1)
+    weights["heads_bias"] = np.concatenate([bias for _, bias in heads])
+    return weights
+
+
+def quantize(weights):
+    """Quantizes every kernel to int8 with one scale per output unit
+    Takes a dict of float32 arrays from read_h5 and returns a dict in which
+    each kernel is int8 and has a float32 <layer>_scale alongside it
+    """
+    quantized = dict(weights)
+    for name in LAYERS:
+        kernel = weights[f"{name}_kernel"]
+        scale = np.abs(kernel).max(axis=0) / 127
+        scale[scale == 0] = 1 # A unit with no weights stays zero
+        quantized[f"{name}_kernel"] = np.clip(np.rint(kernel / scale), -127, 127).astype(np.int8)
+        quantized[f"{name}_scale"] = scale.astype(np.float32)
+    return quantized
+
+
+def export(h5_path, out_path=None, int8=False):
+    """Exports a Keras weight file to an .npz file for NumpyModel
+    Takes a string h5_path, an optional string out_path (next to h5_path by
+    default, with an -int8 suffix for int8 exports) and a boolean int8 and
+    returns the string path written
+    """
+    if out_path is None:
+        out_path = os.path.splitext(h5_path)[0] + ("-int8.npz" if int8 else ".npz")
+    weights = read_h5(h5_path)
+    np.savez(out_path, **(quantize(weights) if int8 else weights))
+    return out_path
+
+
+def load(path):
+    """Loads an exported .npz file, or reads a Keras .h5 file directly
+    Takes a string path and returns a NumpyModel
+    """
+    if path.endswith(".h5"):
+        return NumpyModel(read_h5(path))
+    with np.load(path) as f:
+        return NumpyModel(dict(f))
+
+
+class NumpyModel:
+    """Runs the CNN forward pass with NumPy
+    predict mirrors the Keras model it replaces, so ai_vs_cnn can use either.
+    """
+
+    def __init__(self, weights):
+        self.int8 = "conv1_scale" in weights
+        self.kernels, self.biases, self.scales = {}, {}, {}
+        for name in LAYERS:
+            # int8 kernels are kept as float32 holding integer values, so the
+            # products run through the same BLAS matmul as the float model
+            self.kernels[name] = weights[f"{name}_kernel"].astype(np.float32)
+            self.biases[name] = weights[f"{name}_bias"].astype(np.float32)
+            if self.int8:
+                self.scales[name] = weights[f"{name}_scale"].astype(np.float32)
+
+    def _layer(self, name, x):
+        """Multiplies a batch of rows by a layer's kernel and adds its bias
+        In an int8 model each row is first quantized to integers in
+        [-127, 127]. Sums of at most 288 products of two such integers stay
+        below 2**24, so float32 holds them exactly, as an int32 accumulator would.
+        Takes a string layer name and an (n, inputs) float32 array and returns
+        an (n, outputs) float32 array
+        """
+        if not self.int8:
+            return x @ self.kernels[name] + self.biases[name]
+        row_scale = np.abs(x).max(axis=1, keepdims=True) / 127
+        row_scale[row_scale == 0] = 1
+        x = np.rint(x / row_scale)
+        return (x @ self.kernels[name]) * (row_scale * self.scales[name]) + self.biases[name]
+
+    def probabilities(self, data_points):
+        """Runs a batch of encoded boards through the network
+        Takes an (n, 8, 8) or (n, 8, 8, 1) numpy array and returns an
+        (n, 4, 8) float32 numpy array, the softmax of each head
+        """
+        x = np.asarray(data_points, dtype=np.float32).reshape(-1, 8, 8)
+        n = len(x)
+
+        # 3x3 convolution to 32 channels, one row of 9 inputs per window
+        x = sliding_window_view(x, (3, 3), axis=(1, 2)).reshape(n * 36, 9)
+        x = np.maximum(self._layer("conv1", x), 0).reshape(n, 6, 6, 32)
+
+        # 2x2 max pooling
+        x = x.reshape(n, 3, 2, 3, 2, 32).max(axis=(2, 4))
+
+        # 3x3 convolution to 64 channels, the whole 3x3x32 map is its only window
+        x = np.maximum(self._layer("conv2", x.reshape(n, 288)), 0)
+        x = np.maximum(self._layer("dense", x), 0)
+
+        logits = self._layer("heads", x).reshape(n, 4, 8)
+        logits -= logits.max(axis=2, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=2, keepdims=True)
+
+    def predict(self, data_points, verbose=0):
+        """Predicts like the Keras model does
+        Takes an (n, 8, 8, 1) numpy array and returns a list of 4 (n, 8)
+        numpy arrays, one per head
+        """
+        probabilities = self.probabilities(data_points)
+        return [probabilities[:, i] for i in range(4)]
+
+
+def parity(reference, candidate, data_points):
+    """Compares the predictions of two models on the same boards
+    Takes two models with a Keras-like predict and an (n, 8, 8) numpy array
+    and returns a Parity
+    """
+    data_points = np.expand_dims(data_points, axis=-1)
+    expected = np.stack(reference.predict(data_points, verbose=0), axis=1)
+    actual = np.stack(candidate.predict(data_points, verbose=0), axis=1)
+    same = expected.argmax(axis=2) == actual.argmax(axis=2)
+    return Parity(float(np.abs(expected - actual).max()), float(same.mean()), float(same.all(axis=1).mean()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="The CNN as a plain NumPy forward pass")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Export Keras weight files to .npz files")
+    export_parser.add_argument("h5_paths", nargs="+")
+    export_parser.add_argument("--int8", action="store_true", help="Quantize the weights to int8")
+    args = parser.parse_args()
+
+    for h5_path in args.h5_paths:
+        out_path = export(h5_path, int8=args.int8)
+        print(f"{h5_path} ({os.path.getsize(h5_path) / 1024:.0f}KB) -> {out_path} ({os.path.getsize(out_path) / 1024:.0f}KB)")
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Move ordering for the search
+Alpha-beta prunes the most when the best move is searched first. MoveOrder
+hands the search its moves in stages, best candidates first:
+
+    1. the hash move, the best move the transposition table remembers,
+       tried before any move is generated once Position.is_legal has
+       checked it, since a table entry may belong to another position
+    2. captures and queen promotions, most valuable victim first and
+       least valuable attacker first among equal victims (MVV-LVA)
+    3. the killer moves, quiet moves that caused a cutoff at the same ply
+    4. the other quiet moves, by their history score
+    5. captures the static exchange evaluation expects to lose material
+
+Each stage is only prepared when the one before it is used up, so a cutoff
+on the hash move skips move generation and a cutoff on a capture skips
+sorting the quiet moves.
+"""
+from operator import itemgetter
+from bitboard import unpack_move
+from exchange import static_exchange
+
+# Piece values for MVV-LVA, indexed by the ASCII code of the piece char
+ORDER_VALUES = [0] * 128
+for char, value in zip("pnbrqk", [1, 2, 3, 4, 5, 6]):
+    ORDER_VALUES[ord(char)] = ORDER_VALUES[ord(char.upper())] = value
+
+EMPTY = ord(".")
+
+
+class MoveOrder:
+    """Killer moves and history scores gathered while searching
+    One MoveOrder serves every search of a Searcher. Killers are forgotten
+    between searches and history scores fade.
+    """
+
+    def __init__(self, max_ply=64):
+        self.killers = [[None, None] for _ in range(max_ply + 1)] # Two per ply, newest first
+        self.history = [0] * (128 * 64) # Indexed by piece code << 6 | to_sq
+
+    def new_search(self):
+        """Forgets the killers and halves the history scores
+        Takes nothing and returns None
+        """
+        for killers in self.killers:
+            killers[0] = killers[1] = None
+        self.history = [score >> 1 for score in self.history]
+        return None
+
+    def record_cutoff(self, position, move, depth, ply):
+        """Remembers a quiet move that caused a beta cutoff
+        Called with the move taken back, so the board is the one it was played on.
+        Takes a Position, a tuple (from_sq, to_sq, promotion) and the integers
+        depth and ply of the node and returns None
+        """
+        from_sq, to_sq, promotion = move
+        if position.codes[to_sq] != EMPTY or promotion:
+            return None
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[position.codes[from_sq] << 6 | to_sq] += depth * depth
+        return None
+
+    def moves(self, position, hash_move=None, ply=0):
+        """Yields the legal moves of a position in stages, best candidates first
+        A hash move that is not legal in the position is dropped.
+        Takes a Position, an optional packed hash move (see bitboard.pack_move)
+        and the integer ply of the node and yields tuples (from_sq, to_sq, promotion)
+        """
+        if hash_move is not None:
+            if position.is_legal(hash_move):
+                hash_move = unpack_move(hash_move)
+                yield hash_move
+            else:
+                hash_move = None
+
+        codes = position.codes
+        captures, quiets, bad_captures = [], [], []
+        for from_sq, to_sq in position.generate_legal():
+            victim = codes[to_sq]
+            for promotion in position.promotions(from_sq, to_sq):
+                move = (from_sq, to_sq, promotion)
+                if move == hash_move:
+                    continue
+                if victim != EMPTY:
+                    captures.append((ORDER_VALUES[victim] * 8 - ORDER_VALUES[codes[from_sq]], move))
+                elif promotion == "q" or promotion == "Q":
+                    captures.append((ORDER_VALUES[ord("q")] * 8, move))
+                else:
+                    quiets.append(move)
+
+        captures.sort(key=itemgetter(0), reverse=True)
+        for _, move in captures:
+            from_sq, to_sq, _ = move
+            # Only a capture by a more valuable piece can lose material
+            if ORDER_VALUES[codes[from_sq]] > ORDER_VALUES[codes[to_sq]] and static_exchange(position, from_sq, to_sq) < 0:
+                bad_captures.append(move)
+            else:
+                yield move
+
+        for killer in self.killers[ply]:
+            if killer is not None and killer in quiets:
+                quiets.remove(killer)
+                yield killer
+
+        history = self.history
+        quiets.sort(key=lambda move: history[codes[move[0]] << 6 | move[1]], reverse=True)
+        yield from quiets
+        yield from bad_captures
+
+
+def capture_moves(position):
+    """Finds the captures and queen promotions of a position, MVV-LVA first
+    The moves quiescence search plays. Underpromotions are left out.
+    Takes a Position and returns a list of tuples (from_sq, to_sq, promotion)
+    """
+    codes = position.codes
+    occupied = position.occupied
+    captures = []
+    for from_sq, to_sq in position.generate_legal():
+        promotion = position.promotions(from_sq, to_sq)[0] # The queen, when it is a promotion
+        if occupied >> to_sq & 1:
+            captures.append((ORDER_VALUES[codes[to_sq]] * 8 - ORDER_VALUES[codes[from_sq]], (from_sq, to_sq, promotion)))
+        elif promotion:
+            captures.append((ORDER_VALUES[ord("q")] * 8, (from_sq, to_sq, promotion)))
+    captures.sort(key=itemgetter(0), reverse=True)
+    return [move for _, move in captures]
+
+
+def scan_order(position, hash_move=None, ply=0):
+    """Yields the legal moves in the order the generator finds them, after the hash move
+    The baseline MoveOrder.moves is measured against. The moves come from
+    Position.iter_moves, so a cutoff skips generating the moves of the
+    pieces not reached yet.
+    A hash move that is not legal in the position is dropped.
+    Takes a Position, an optional packed hash move and an unused ply and
+    yields tuples (from_sq, to_sq, promotion)
+    """
+    if hash_move is not None and position.is_legal(hash_move):
+        yield unpack_move(hash_move)
+    for move in position.iter_moves():
+        if move != hash_move:
+            yield unpack_move(move)
@@ -0,0 +1,119 @@
+"""
+Perft: counts the leaf nodes of the move tree to a fixed depth
+Used to check the move generator against known node counts and to
+measure its speed in nodes per second.
+
+Usage:
+    python perft.py 4                    # From the starting board
+    python perft.py 3 --fen "<FEN>"      # From any position
+    python perft.py 3 --divide           # Node count below every root move
+    python perft.py 4 --suite            # Reference positions with known counts
+"""
+import argparse
+import sys
+import time
+from bitboard import START_FEN, from_fen, move_name
+
+# Reference positions and node counts under this game's rules, which have
+# no castling and no en passant. The starting position, position 3 up to
+# depth 2 and position 6 never reach those moves and match the published
+# counts. Deeper position 3 counts leave out its en-passant captures, and
+# the others are the published positions with castling rights removed.
+SUITE = [
+    ("Starting position", START_FEN, [20, 400, 8902, 197281]),
+    ("Kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w - - 0 1", [46, 1865, 86585]),
+    ("Position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2810, 43087]),
+    ("Position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w - - 0 1", [6, 258, 9217, 404404]),
+    ("Position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w - - 1 8", [43, 1452, 59922]),
+    ("Position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890]),
+]
+
+
+def perft(position, depth):
+    """Counts the leaf nodes of the move tree below a position
+    Every promotion piece counts as a separate move.
+    Takes a Position and an integer depth and returns an integer
+    """
+    if depth == 0:
+        return 1
+    moves = position.generate_legal()
+    if depth == 1:
+        return sum(len(position.promotions(from_sq, to_sq)) for from_sq, to_sq in moves)
+    nodes = 0
+    for from_sq, to_sq in moves:
+        for promotion in position.promotions(from_sq, to_sq):
+            position.push(from_sq, to_sq, promotion)
+            nodes += perft(position, depth - 1)
+            position.unmake_move()
+    return nodes
+
+
+def divide(position, depth):
+    """Counts the leaf nodes below every root move
+    Takes a Position and an integer depth and returns a dictionary of
+    move name to node count
+    """
+    counts = {}
+    for from_sq, to_sq in position.generate_legal():
+        for promotion in position.promotions(from_sq, to_sq):
+            position.push(from_sq, to_sq, promotion)
+            counts[move_name(from_sq, to_sq, promotion)] = perft(position, depth - 1)
+            position.unmake_move()
+    return counts
+
+
+def timed_perft(position, depth):
+    """Runs perft and measures it
+    Takes a Position and an integer depth and returns a tuple (nodes, seconds)
+    """
+    start = time.perf_counter()
+    nodes = perft(position, depth)
+    return nodes, time.perf_counter() - start
+
+
+def run_suite(max_depth):
+    """Runs perft on every reference position up to max_depth and compares the counts
+    Takes an integer max_depth and returns True if every count matched
+    """
+    passed = True
+    total_nodes, total_time = 0, 0.0
+    for name, fen, counts in SUITE:
+        for depth, expected in enumerate(counts[:max_depth], start=1):
+            nodes, seconds = timed_perft(from_fen(fen), depth)
+            total_nodes += nodes
+            total_time += seconds
+            status = "ok" if nodes == expected else f"FAIL (expected {expected})"
+            print(f"{name:<18} depth {depth}: {nodes:>9} nodes {seconds:8.2f}s  {status}")
+            passed = passed and nodes == expected
+    print(f"\n{total_nodes} nodes in {total_time:.2f}s ({total_nodes / total_time:,.0f} nodes/s)")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count move-tree leaf nodes to a fixed depth")
+    parser.add_argument("depth", type=int, nargs="?", default=3)
+    parser.add_argument("--fen", default=START_FEN, help="Position to start from")
+    parser.add_argument("--divide", action="store_true", help="Show the node count below every root move")
+    parser.add_argument("--suite", action="store_true", help="Run the reference positions up to depth")
+    args = parser.parse_args()
+
+    if args.suite:
+        return 0 if run_suite(args.depth) else 1
+
+    position = from_fen(args.fen)
+    start = time.perf_counter()
+    if args.divide:
+        counts = divide(position, args.depth)
+        for name in sorted(counts):
+            print(f"{name}: {counts[name]}")
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(position, args.depth)
+    seconds = time.perf_counter() - start
+    print(f"\nNodes: {nodes}")
+    print(f"Time: {seconds:.2f}s ({nodes / seconds:,.0f} nodes/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
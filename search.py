@@ -0,0 +1,428 @@
+"""
+Alpha-beta search
+A negamax search with alpha-beta pruning and iterative deepening over the
+legal move generator of bitboard.Position. Positions are scored by material
+and piece-square tables. Every search runs under a budget of seconds and/or
+nodes and returns the best move of the deepest iteration it completed,
+together with the depth, node count and speed.
+
+A player is a function that takes a Position, its list of legal moves and
+the dict of Zobrist keys the game went through and returns a tuple
+(curr_pos, next_pos, promotion). random_player and Searcher.play are the
+players the game loops choose between, eg.
+
+    python ai_vs_ai.py --white search --time 0.2
+"""
+import argparse
+import random
+import time
+from collections import namedtuple
+from bitboard import PIECES, SQUARES, START_FEN, from_fen, move_name, pack_move
+from exchange import EXCHANGE_VALUES, static_exchange
+from ordering import MoveOrder, capture_moves, scan_order
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+MATE = 100000 # Score of a mate on the board, less the plies it takes to get there
+MATE_BOUND = MATE - 1000 # Scores beyond this are mates
+INFINITY = MATE + 1
+DELTA_MARGIN = 200 # Positional swing a capture may bring on top of the piece it wins
+
+PIECE_VALUES = {"p": 100, "n": 320, "b": 330, "r": 500, "q": 900, "k": 0}
+
+# Piece-square bonuses for white, listed from row 0 (the row white promotes
+# on) to row 7, so a square indexes them directly. Black reads them mirrored.
+PIECE_SQUARE = {
+    "p": [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    "n": [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    "b": [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    "r": [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ],
+    "q": [
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ],
+    "k": [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ],
+}
+
+
+def _square_scores():
+    """Joins material and piece-square bonuses into one table per piece
+    White pieces score positive and black pieces negative.
+    Takes nothing and returns a dict of piece char to a list of 64 integers
+    """
+    scores = {}
+    for char in PIECES:
+        kind = char.lower()
+        if char.islower():
+            scores[char] = [PIECE_VALUES[kind] + PIECE_SQUARE[kind][sq] for sq in range(64)]
+        else:
+            scores[char] = [-PIECE_VALUES[kind] - PIECE_SQUARE[kind][sq ^ 56] for sq in range(64)]
+    return scores
+
+SQUARE_SCORES = _square_scores()
+
+
+def evaluate(position):
+    """Scores a position by material and piece placement
+    Takes a Position and returns an integer, positive when the player to move is ahead
+    """
+    score = 0
+    for char, bb in position.pieces.items():
+        table = SQUARE_SCORES[char]
+        while bb:
+            lsb = bb & -bb
+            score += table[lsb.bit_length() - 1]
+            bb ^= lsb
+    return score if position.is_white_turn else -score
+
+
+def score_to_table(score, ply):
+    """Turns a mate score counted from the root into one counted from the node
+    so that it stays right when the node is reached at another ply
+    Takes integers score and ply and returns an integer
+    """
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """Undoes score_to_table for a node reached at ply
+    Takes integers score and ply and returns an integer
+    """
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+
+# move is a tuple (from_sq, to_sq, promotion), depth the deepest completed iteration
+SearchResult = namedtuple("SearchResult", ["move", "score", "depth", "nodes", "seconds", "nodes_per_second"])
+
+
+class BudgetExhausted(Exception):
+    """Raised inside the search when its time or node budget runs out"""
+
+
+class Searcher:
+    """Negamax alpha-beta search with iterative deepening
+    A search stops at max_depth, or when time_limit seconds or node_limit
+    nodes are used up, whichever comes first. Leave a limit at None to not
+    apply it. Results are shared between searches through a transposition
+    table of table_megabytes (0 to search without one). With ordering off,
+    moves are searched in generation order, after the hash move. With
+    quiescence on, the leaves play out their captures before they are
+    evaluated, skipping captures that exchange_pruning finds losing.
+    """
+
+    def __init__(self, time_limit=0.5, node_limit=None, max_depth=64, table_megabytes=4, ordering=True,
+                 quiescence=True, exchange_pruning=True):
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        self.table = TranspositionTable(table_megabytes) if table_megabytes else None
+        self.order = MoveOrder(max_depth) if ordering else None
+        self.quiescence = quiescence
+        self.exchange_pruning = exchange_pruning
+        self.results = [] # SearchResult of every search, for statistics
+        self.nodes = 0
+        self.deadline = None
+        self.seen = {}
+        self.path = set()
+
+    def _check_budget(self):
+        """Stops the search once its time or node budget is used up
+        Takes nothing and returns None
+        """
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise BudgetExhausted
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise BudgetExhausted
+        return None
+
+    def search(self, position, seen=None):
+        """Finds the best move of the player to move
+        Takes a Position and an optional dict seen of the Zobrist keys the
+        game has already been through (any position reached again scores as
+        a draw) and returns a SearchResult, whose move is None when the
+        player has no legal move
+        """
+        start = time.perf_counter()
+        self.deadline = start + self.time_limit if self.time_limit is not None else None
+        self.nodes = 0
+        self.seen = seen or {}
+        self.path = set()
+        if self.table is not None:
+            self.table.new_search()
+        if self.order is not None:
+            self.order.new_search()
+
+        root_moves = [(from_sq, to_sq, promotion) for from_sq, to_sq in position.generate_legal()
+                      for promotion in position.promotions(from_sq, to_sq)]
+        best_move, best_score, depth_reached = (root_moves[0] if root_moves else None), 0, 0
+        for depth in range(1, self.max_depth + 1):
+            if not root_moves or len(root_moves) == 1 and depth > 1: # Nothing to choose between
+                break
+            try:
+                score, move = self._search_root(position, root_moves, depth)
+            except BudgetExhausted:
+                break
+            best_move, best_score, depth_reached = move, score, depth
+            root_moves.remove(move) # Search the best move first in the next iteration
+            root_moves.insert(0, move)
+            if abs(score) >= MATE - self.max_depth: # A forced mate was found
+                break
+            # The next iteration takes several times longer than this one
+            if self.deadline is not None and time.perf_counter() - start > self.time_limit / 2:
+                break
+
+        seconds = time.perf_counter() - start
+        result = SearchResult(best_move, best_score, depth_reached, self.nodes, seconds,
+                              self.nodes / seconds if seconds else 0.0)
+        self.results.append(result)
+        return result
+
+    def _search_root(self, position, root_moves, depth):
+        """Searches every root move to depth
+        Takes a Position, a list of (from_sq, to_sq, promotion) moves and an
+        integer depth and returns a tuple (score, best move)
+        """
+        alpha, best_move = -INFINITY, root_moves[0]
+        self.path.add(position.key)
+        try:
+            for move in root_moves:
+                position.push(*move)
+                try:
+                    score = -self._negamax(position, depth - 1, -INFINITY, -alpha, 1)
+                finally:
+                    position.unmake_move()
+                if score > alpha:
+                    alpha, best_move = score, move
+        finally:
+            self.path.discard(position.key)
+        return alpha, best_move
+
+    def _negamax(self, position, depth, alpha, beta, ply):
+        """Scores a position by searching depth plies below it
+        Takes a Position, an integer depth, the integer bounds alpha and
+        beta of the window and the integer ply from the root and returns an
+        integer score from the side to move's point of view
+        """
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self._check_budget()
+
+        key = position.key
+        if key in self.path or key in self.seen: # A repetition, play it as a draw
+            return 0
+        if depth == 0:
+            return self._quiescence(position, alpha, beta) if self.quiescence else evaluate(position)
+
+        table = self.table
+        hash_move = None
+        if table is not None:
+            entry = table.probe(key)
+            if entry is not None:
+                entry_depth, score, bound, hash_move = entry
+                if entry_depth >= depth:
+                    score = score_from_table(score, ply)
+                    if bound == EXACT or bound == LOWER and score >= beta or bound == UPPER and score <= alpha:
+                        return score
+
+        order = self.order
+        alpha_original = alpha
+        best_score, best_move = -INFINITY, None
+        self.path.add(key)
+        try:
+            for move in order.moves(position, hash_move, ply) if order else scan_order(position, hash_move):
+                position.push(*move)
+                try:
+                    score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+                finally:
+                    position.unmake_move()
+                if score > best_score:
+                    best_score, best_move = score, move
+                    if score > alpha:
+                        alpha = score
+                        if score >= beta:
+                            if order:
+                                order.record_cutoff(position, move, depth, ply)
+                            break
+        finally:
+            self.path.discard(key)
+
+        if best_move is None: # No legal move
+            return -MATE + ply if position.in_check() else 0
+
+        if table is not None:
+            if best_score >= beta:
+                bound = LOWER
+            elif best_score <= alpha_original: # No move raised alpha, so none is known to be best
+                bound, best_move = UPPER, None
+            else:
+                bound = EXACT
+            table.store(key, depth, score_to_table(best_score, ply), bound, best_move and pack_move(*best_move))
+        return best_score
+
+    def _quiescence(self, position, alpha, beta):
+        """Scores a position once its captures have been played out
+        The player to move may stand pat on the static evaluation instead of
+        capturing. Captures that cannot lift the score to alpha even with a
+        margin (delta pruning) and captures that lose material in the
+        exchange are not played.
+        Takes a Position and the integer bounds alpha and beta and returns an
+        integer score from the side to move's point of view
+        """
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self._check_budget()
+
+        best_score = evaluate(position)
+        if best_score >= beta:
+            return best_score
+        stand_pat = best_score
+        alpha = max(alpha, stand_pat)
+
+        codes = position.codes
+        for from_sq, to_sq, promotion in capture_moves(position):
+            if not promotion:
+                if stand_pat + EXCHANGE_VALUES[codes[to_sq]] + DELTA_MARGIN <= alpha:
+                    continue
+                if self.exchange_pruning and static_exchange(position, from_sq, to_sq) < 0:
+                    continue
+            position.push(from_sq, to_sq, promotion)
+            try:
+                score = -self._quiescence(position, -beta, -alpha)
+            finally:
+                position.unmake_move()
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if score >= beta:
+                        break
+        return best_score
+
+    def play(self, position, all_moves, seen=None):
+        """Chooses a move for a game loop
+        Takes a Position, its list of legal moves (unused, the search makes
+        its own) and an optional dict seen of the keys the game went through
+        and returns a tuple (curr_pos, next_pos, promotion)
+        """
+        from_sq, to_sq, promotion = self.search(position, seen).move
+        return SQUARES[from_sq], SQUARES[to_sq], promotion
+
+    def summary(self):
+        """Averages the statistics of every search so far
+        Takes nothing and returns a string
+        """
+        if not self.results:
+            return "No searches"
+        searches = len(self.results)
+        nodes = sum(result.nodes for result in self.results)
+        seconds = sum(result.seconds for result in self.results)
+        depth = sum(result.depth for result in self.results) / searches
+        summary = (f"{searches} searches, mean depth {depth:.1f}, {nodes / searches:,.0f} nodes/search, "
+                   f"{nodes / seconds if seconds else 0:,.0f} nodes/s")
+        if self.table is not None:
+            summary += f"\nTransposition table: {self.table.summary()}"
+        return summary
+
+
+def random_player(position, all_moves, seen=None):
+    """Chooses a random legal move, promoting to a random piece
+    Takes a Position, its list of legal moves and an unused dict seen and
+    returns a tuple (curr_pos, next_pos, None)
+    """
+    curr_pos, next_pos = random.choice(all_moves)
+    return curr_pos, next_pos, None
+
+
+PLAYERS = ["random", "search"]
+
+
+def make_player(name, time_limit=0.5, node_limit=None, table_megabytes=4):
+    """Builds a player by name, for the command lines of the game scripts
+    Takes a string name from PLAYERS, the search budget and the size of the
+    transposition table and returns a tuple (player function, Searcher or None)
+    """
+    if name == "random":
+        return random_player, None
+    searcher = Searcher(time_limit, node_limit, table_megabytes=table_megabytes)
+    return searcher.play, searcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search one position")
+    parser.add_argument("--fen", default=START_FEN)
+    parser.add_argument("--time", type=float, default=1.0, help="Seconds for the search (0: no limit)")
+    parser.add_argument("--nodes", type=int, default=None, help="Node budget of the search")
+    parser.add_argument("--depth", type=int, default=64, help="Deepest iteration")
+    parser.add_argument("--table", type=float, default=4, help="Megabytes of transposition table (0: none)")
+    args = parser.parse_args()
+
+    searcher = Searcher(args.time or None, args.nodes, args.depth, args.table)
+    result = searcher.search(from_fen(args.fen))
+    move = move_name(*result.move) if result.move else "none"
+    print(f"Best move {move}, score {result.score}, depth {result.depth}, {result.nodes:,} nodes "
+          f"in {result.seconds:.2f}s ({result.nodes_per_second:,.0f} nodes/s)")
+    if searcher.table is not None:
+        print(f"Transposition table: {searcher.table.summary()}")
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Headless self-play runner
+Plays many ai_vs_ai games across a pool of worker processes. Every game
+starts from its own fresh Position, so workers share no board state, and
+only a compact GameResult travels back to the parent process.
+
+Usage:
+    python self_play.py --games 1000 --workers 8
+"""
+import argparse
+import functools
+import json
+import multiprocessing
+import random
+import time
+from bitboard import START_FEN, from_fen
+from game_output import QUIET
+import ai_vs_ai
+
+
+def play_game(seed, repetitions=True):
+    """Plays one silent game with its own random seed
+    Takes an integer seed and a boolean repetitions (see ai_vs_ai.game) and
+    returns a tuple (seed, GameResult)
+    """
+    random.seed(seed)
+    return seed, ai_vs_ai.game(from_fen(START_FEN), verbosity=QUIET, repetitions=repetitions)
+
+
+def run(games, workers=None, seed=0, repetitions=True):
+    """Plays games across a process pool
+    Takes the integer number of games, an optional integer number of worker
+    processes (defaults to the number of cores), an integer base seed and a
+    boolean repetitions and returns a tuple (list of GameResult ordered by
+    seed, seconds taken)
+    """
+    workers = workers or multiprocessing.cpu_count()
+    seeds = range(seed, seed + games)
+    play = functools.partial(play_game, repetitions=repetitions)
+    start = time.perf_counter()
+    if workers == 1:
+        results = [play(game_seed) for game_seed in seeds]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            chunksize = max(1, games // (workers * 4))
+            results = list(pool.imap_unordered(play, seeds, chunksize))
+    seconds = time.perf_counter() - start
+    results.sort()
+    return [result for _, result in results], seconds
+
+
+def summarize(results, seconds):
+    """Prints the outcome counts, the average game length and the throughput
+    Takes a list of GameResult and a float seconds and returns None
+    """
+    outcomes = {"WHITE": 0, "BLACK": 0, "DRAW": 0}
+    for result in results:
+        outcomes[result.outcome] += 1
+    plies = sum(result.plies for result in results)
+    print(f"Games: {len(results)}  White: {outcomes['WHITE']}  Black: {outcomes['BLACK']}  Draw: {outcomes['DRAW']}")
+    print(f"Average length: {plies / len(results):.1f} plies")
+    print(f"Time: {seconds:.2f}s ({len(results) / seconds:.1f} games/s, {plies / seconds:,.0f} plies/s)")
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play silent ai_vs_ai games in parallel")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: number of cores)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first game, later games count up")
+    parser.add_argument("--out", help="Write one JSON line per game to this file")
+    parser.add_argument("--no-repetition", action="store_true", help="Play on through threefold repetitions")
+    args = parser.parse_args()
+
+    results, seconds = run(args.games, args.workers, args.seed, not args.no_repetition)
+    summarize(results, seconds)
+    if args.out:
+        with open(args.out, "w") as f:
+            for game_seed, result in enumerate(results, start=args.seed):
+                f.write(json.dumps({"seed": game_seed, **result._asdict()}) + "\n")
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Transposition table
+A fixed-size table of search results keyed by the Zobrist key of a
+position, so a position reached again through another move order is not
+searched again. The table lives in two flat arrays of 64-bit integers, the
+full keys and the packed entries, sized to a cap in megabytes.
+
+Entries sit in buckets of two slots. The first keeps the deepest result
+stored in the bucket, the second always takes the newest result the first
+did not, so deep results survive while recent shallow ones still get
+stored. A result left over from an earlier search can be replaced at any depth.
+"""
+from array import array
+
+EXACT, LOWER, UPPER = 0, 1, 2 # The score is exact, a lower bound (fail high) or an upper bound (fail low)
+
+ENTRY_BYTES = 16 # One 64-bit key and one 64-bit packed entry
+NO_MOVE = 0xFFFF # Stored when a result has no best move, eg. every move failed low
+SCORE_OFFSET = 1 << 29 # Keeps packed scores positive
+
+
+def pack_entry(depth, score, bound, move, generation):
+    """Packs a search result into one 64-bit integer
+    From the low bits: move 16, bound 2, depth 8, generation 8, score 30.
+    Takes integers depth, score, bound, move (see bitboard.pack_move, or
+    NO_MOVE) and generation and returns an integer
+    """
+    return (score + SCORE_OFFSET) << 34 | (generation & 255) << 26 | depth << 18 | bound << 16 | move
+
+
+class TranspositionTable:
+    """Stores search results in two-slot buckets under a memory cap
+    probe and store count what they find, so the hit rate and the collision
+    rate at a given size can be read after a search.
+    """
+
+    def __init__(self, megabytes=16):
+        buckets = 1
+        while (buckets * 2) * 2 * ENTRY_BYTES <= megabytes * (1 << 20): # Largest power of two that fits
+            buckets *= 2
+        self.mask = buckets - 1
+        self.keys = array("Q", [0]) * (buckets * 2)
+        self.entries = array("Q", [0]) * (buckets * 2)
+        self.generation = 0
+        self.probes = self.hits = self.collisions = 0
+        self.stores = self.overwrites = 0
+
+    @property
+    def megabytes(self):
+        return len(self.keys) * ENTRY_BYTES / (1 << 20)
+
+    def new_search(self):
+        """Ages every stored result, so a new search may overwrite them freely
+        Takes nothing and returns None
+        """
+        self.generation = (self.generation + 1) & 255
+        return None
+
+    def clear(self):
+        """Empties the table and resets its counters
+        Takes nothing and returns None
+        """
+        self.keys = array("Q", [0]) * len(self.keys)
+        self.entries = array("Q", [0]) * len(self.entries)
+        self.probes = self.hits = self.collisions = 0
+        self.stores = self.overwrites = 0
+        return None
+
+    def probe(self, key):
+        """Looks up the result stored for a position
+        A bucket holding other positions counts as a collision.
+        Takes an integer Zobrist key and returns a tuple (depth, score,
+        bound, move) or None, where move is None when no best move was stored
+        """
+        self.probes += 1
+        slot = (key & self.mask) << 1
+        keys = self.keys
+        if keys[slot] != key:
+            slot += 1
+            if keys[slot] != key:
+                if keys[slot] or keys[slot - 1]:
+                    self.collisions += 1
+                return None
+        self.hits += 1
+        entry = self.entries[slot]
+        move = entry & 0xFFFF
+        return entry >> 18 & 255, (entry >> 34) - SCORE_OFFSET, entry >> 16 & 3, None if move == NO_MOVE else move
+
+    def store(self, key, depth, score, bound, move=None):
+        """Stores a search result in the bucket of its position
+        The first slot takes the result when it is as deep as the one there,
+        belongs to the same position or the one there is from an older
+        search; otherwise the second slot does.
+        Takes an integer Zobrist key, integers depth, score and bound and an
+        optional packed move and returns None
+        """
+        self.stores += 1
+        slot = (key & self.mask) << 1
+        entry = pack_entry(depth, score, bound, NO_MOVE if move is None else move, self.generation)
+        current = self.entries[slot]
+        if not (self.keys[slot] == key or depth >= current >> 18 & 255
+                or current >> 26 & 255 != self.generation):
+            slot += 1
+        if self.keys[slot] and self.keys[slot] != key:
+            self.overwrites += 1
+        self.keys[slot] = key
+        self.entries[slot] = entry
+        return None
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def fill(self):
+        """Finds the share of slots in use
+        Takes nothing and returns a float between 0 and 1
+        """
+        return 1 - self.keys.count(0) / len(self.keys)
+
+    def summary(self):
+        """Describes the size of the table and its counters
+        Takes nothing and returns a string
+        """
+        return (f"{self.megabytes:.1f}MB, {len(self.keys):,} slots, {self.fill():.1%} full, "
+                f"{self.hits:,} hits in {self.probes:,} probes ({self.hit_rate():.1%}), "
+                f"{self.collisions:,} collisions, {self.overwrites:,} overwrites")